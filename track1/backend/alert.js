@@ -17,4 +17,8 @@ const alertSchema = new mongoose.Schema({
   alertCount: { type: Number, default: 1 }
 });
 
+// Persistence check (countDocuments by twin/field over a time window) and open-alert listing
+alertSchema.index({ twinId: 1, field: 1, resolved: 1, timestamp: -1 });
+alertSchema.index({ resolved: 1, timestamp: -1 });
+
 module.exports = mongoose.model('Alert', alertSchema);
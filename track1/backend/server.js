@@ -29,6 +29,34 @@ mongoose.connect(process.env.MONGO_URI || 'mongodb://localhost:27017/test', {
 }).then(() => console.log('Mongo connected'))
   .catch(err => console.error('Mongo connection error', err.message));
 
+// Optional Python prediction service (python predict.py); static thresholds are the fallback
+const PREDICT_URL = process.env.PREDICT_URL;
+const PREDICT_ALERT_PROB = parseFloat(process.env.PREDICT_ALERT_PROB || '0.8');
+
+async function fetchPrediction(collection, docs) {
+  if (!PREDICT_URL || typeof fetch !== 'function' || docs.length === 0) return null;
+  try {
+    const response = await fetch(`${PREDICT_URL}/predict/${encodeURIComponent(collection)}`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ docs }),
+      signal: AbortSignal.timeout(2000),
+    });
+    if (!response.ok) return null;
+    const { predictions } = await response.json();
+    return predictions && predictions.length > 0 ? predictions : null;
+  } catch (err) {
+    console.warn('Prediction service unavailable:', err.message);
+    return null;
+  }
+}
+
+async function countRecentAlerts(twinId, field) {
+  // Unresolved alerts for this twin/field in the last 5 minutes; any makes the next one persistent
+  const fiveMinutesAgo = new Date(Date.now() - 5 * 60 * 1000);
+  return Alert.countDocuments({ twinId, field, timestamp: { $gte: fiveMinutesAgo }, resolved: false });
+}
+
 app.get('/api/twin/:twinId', authenticateJwt, async (req, res) => {
   const { twinId } = req.params;
   try {
@@ -36,9 +64,27 @@ app.get('/api/twin/:twinId', authenticateJwt, async (req, res) => {
     const data = await collection.find().sort({ ts: -1 }).limit(50).toArray();
     const latest = data[0] || {};
     const fields = Object.keys(latest).filter(k => !['_id', 'ts', 'twinId'].includes(k));
-    
-    // Store alerts in MongoDB for high-risk values
-    if (latest && fields.length > 0) {
+    const prediction = await fetchPrediction(twinId, data);
+
+    if (prediction) {
+      // Model-based alerts: one per twin whose newest reading is likely to precede a failure
+      for (const p of prediction) {
+        if (p.latestProb >= PREDICT_ALERT_PROB) {
+          const recentAlerts = await countRecentAlerts(twinId, 'failureProbability');
+          await Alert.create({
+            twinId,
+            field: 'failureProbability',
+            value: p.latestProb,
+            threshold: { max: PREDICT_ALERT_PROB },
+            severity: 'high',
+            description: `${p.twinId} failure probability ${p.latestProb.toFixed(2)} (model v${p.modelVersion}) exceeds ${PREDICT_ALERT_PROB}`,
+            isPersistent: recentAlerts >= 1,
+            alertCount: recentAlerts + 1
+          });
+        }
+      }
+    } else if (latest && fields.length > 0) {
+      // Store alerts in MongoDB for high-risk values
       const thresholds = {
         drillrig1: { torque: { min: 50, max: 150 }, pressure: { min: 10, max: 60 }, vibration: { min: 20, max: 100 } },
         wellhead1: { pressure: { min: 10, max: 60 }, temperature: { min: 50, max: 100 }, flowRate: { min: 100, max: 500 } },
@@ -58,14 +104,7 @@ app.get('/api/twin/:twinId', authenticateJwt, async (req, res) => {
           if (threshold && value != null) {
             const isAbnormal = value < threshold.min || value > threshold.max;
             if (isAbnormal) {
-              // Check for persistent alerts (>1 alert in last 5 minutes)
-              const fiveMinutesAgo = new Date(Date.now() - 5 * 60 * 1000);
-              const recentAlerts = await Alert.countDocuments({
-                twinId,
-                field,
-                timestamp: { $gte: fiveMinutesAgo },
-                resolved: false
-              });
+              const recentAlerts = await countRecentAlerts(twinId, field);
               
               const isPersistent = recentAlerts >= 1;
               
@@ -85,7 +124,7 @@ app.get('/api/twin/:twinId', authenticateJwt, async (req, res) => {
       }
     }
     
-    res.json({ fields, data });
+    res.json({ fields, data, prediction });
   } catch (err) {
     res.status(500).json({ error: 'Failed to fetch data' });
   }
@@ -0,0 +1,131 @@
+"""Server-side aggregation pushdown (MongoDB 5.0+).
+
+Computes per-twin statistics and time-bucketed z-score risk inside MongoDB so
+only compact summaries cross the wire instead of raw telemetry documents.
+``bucket_risk`` reproduces the client-side score in a single pipeline:
+``$setWindowFields`` broadcasts each twin's mean/``$stdDevPop`` to its rows,
+each row gets its out-of-band fraction, and ``$dateTrunc`` groups rows into
+time buckets.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pymongo import MongoClient
+
+from risk import MIN_TWIN_ROWS, SERIES_COLUMNS, SUMMARY_COLUMNS, Z_THRESHOLD, severity_of
+from telemetry import discover_fields
+
+BUCKET_COLUMNS = ["twinId", "ts", "risk", "points"]
+
+
+def _metrics(client: MongoClient, db_name: str, coll: str, metrics: Optional[List[str]]) -> List[str]:
+    if metrics is not None:
+        return list(metrics)
+    return [f for f, kind in discover_fields(client, db_name, coll).items() if kind == "float"]
+
+
+def _window(limit: Optional[int]) -> List[Dict[str, Any]]:
+    # Same newest-N window as load_docs; no limit scores the whole collection
+    if not limit:
+        return []
+    return [{"$sort": {"ts": -1}}, {"$limit": int(limit)}]
+
+
+def twin_stats(
+    client: MongoClient, db_name: str, coll: str, metrics: Optional[List[str]] = None, limit: Optional[int] = None
+) -> pd.DataFrame:
+    """Per-(twinId, metric) mean, population std and count via ``$group``."""
+    metrics = _metrics(client, db_name, coll, metrics)
+    if not metrics:
+        return pd.DataFrame(columns=["twinId", "metric", "mean", "std", "count"])
+    group: Dict[str, Any] = {"_id": "$twinId"}
+    for i, m in enumerate(metrics):
+        group[f"mean{i}"] = {"$avg": f"${m}"}
+        group[f"std{i}"] = {"$stdDevPop": f"${m}"}
+        group[f"count{i}"] = {"$sum": {"$cond": [{"$isNumber": f"${m}"}, 1, 0]}}
+    pipeline = _window(limit) + [{"$match": {"twinId": {"$ne": None}}}, {"$group": group}]
+    rows = []
+    for doc in client[db_name][coll].aggregate(pipeline, allowDiskUse=True):
+        for i, m in enumerate(metrics):
+            rows.append((doc["_id"], m, doc[f"mean{i}"], doc[f"std{i}"], doc[f"count{i}"]))
+    return pd.DataFrame(rows, columns=["twinId", "metric", "mean", "std", "count"])
+
+
+def bucket_risk(
+    client: MongoClient,
+    db_name: str,
+    coll: str,
+    limit: Optional[int] = None,
+    unit: str = "minute",
+    bin_size: int = 1,
+    metrics: Optional[List[str]] = None,
+    min_rows: int = MIN_TWIN_ROWS,
+) -> pd.DataFrame:
+    """Average row risk per (twinId, time bucket), computed server-side.
+
+    Returns columns twinId, ts (bucket start), risk, points. Rows without a
+    timestamp land in a bucket with ts NaT so per-twin averages still count
+    them, as the client-side score does.
+    """
+    metrics = _metrics(client, db_name, coll, metrics)
+    if not metrics:
+        return pd.DataFrame(columns=BUCKET_COLUMNS)
+    whole = {"documents": ["unbounded", "unbounded"]}
+    stats: Dict[str, Any] = {"_n": {"$count": {}, "window": whole}}
+    flags = []
+    for i, m in enumerate(metrics):
+        stats[f"_mean{i}"] = {"$avg": f"${m}", "window": whole}
+        stats[f"_std{i}"] = {"$stdDevPop": f"${m}", "window": whole}
+        std = {"$cond": [{"$or": [{"$eq": [f"$_std{i}", 0]}, {"$eq": [f"$_std{i}", None]}]}, 1, f"$_std{i}"]}
+        z = {"$abs": {"$divide": [{"$subtract": [f"${m}", f"$_mean{i}"]}, std]}}
+        # Missing values give a null z, which compares below the threshold (in-band)
+        flags.append({"$cond": [{"$gt": [z, Z_THRESHOLD]}, 1, 0]})
+    pipeline = _window(limit) + [
+        {"$match": {"twinId": {"$ne": None}}},
+        {"$setWindowFields": {"partitionBy": "$twinId", "output": stats}},
+        {"$match": {"_n": {"$gte": min_rows}}},
+        {"$project": {
+            "_id": 0,
+            "twinId": 1,
+            "ts": {"$convert": {"input": "$ts", "to": "date", "onError": None, "onNull": None}},
+            "risk": {"$divide": [{"$add": flags}, len(metrics)]},
+        }},
+        {"$group": {
+            "_id": {"twinId": "$twinId", "bucket": {"$dateTrunc": {"date": "$ts", "unit": unit, "binSize": bin_size}}},
+            "risk": {"$avg": "$risk"},
+            "points": {"$sum": 1},
+        }},
+        {"$sort": {"_id.twinId": 1, "_id.bucket": 1}},
+    ]
+    rows = [
+        (doc["_id"]["twinId"], doc["_id"].get("bucket"), doc["risk"], doc["points"])
+        for doc in client[db_name][coll].aggregate(pipeline, allowDiskUse=True)
+    ]
+    df = pd.DataFrame(rows, columns=BUCKET_COLUMNS)
+    df["ts"] = pd.to_datetime(df["ts"], errors="coerce")
+    return df
+
+
+def score_buckets(buckets: pd.DataFrame, coll: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Turn ``bucket_risk`` output into (summary, series) shaped like ``risk.score_collection``."""
+    if buckets.empty:
+        return pd.DataFrame(columns=SUMMARY_COLUMNS), pd.DataFrame(columns=SERIES_COLUMNS)
+    weighted = buckets["risk"].astype(float) * buckets["points"]
+    per_twin = pd.DataFrame({"w": weighted, "points": buckets["points"]}).groupby(buckets["twinId"], sort=False).sum()
+    avg = np.clip((per_twin["w"] / per_twin["points"]).to_numpy(), 0.0, 1.0)
+    summary = pd.DataFrame({
+        "collection": coll,
+        "twinId": per_twin.index,
+        "risk": avg,
+        "severity": severity_of(avg),
+        "rows": per_twin["points"].to_numpy(),
+    })
+    timed = buckets[buckets["ts"].notna()]
+    series = pd.DataFrame({
+        "collection": coll,
+        "twinId": timed["twinId"].to_numpy(),
+        "ts": timed["ts"].to_numpy(),
+        "risk": np.clip(timed["risk"].astype(float).to_numpy(), 0.0, 1.0),
+    })
+    return summary, series
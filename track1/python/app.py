@@ -1,42 +1,65 @@
+import logging
 import os
 import time
 from datetime import datetime
-from typing import List, Dict, Any
 
-import numpy as np
 import pandas as pd
 import streamlit as st
-import matplotlib.pyplot as plt
 from pymongo import MongoClient
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report
+
+from aggregate import bucket_risk, score_buckets, twin_stats
+from cache import TelemetryCache
+from charts import downsample_series, render_risk_png, risk_chart_altair
+from compact import compact_frame
+from costs import what_if
+from features import RollingFeatures, WINDOWS
+from indexes import check_indexes
+from ingest import IngestWorker, LiveRiskStore
+from metrics import REGISTRY, RunMetrics, start_metrics_server
+from online import OnlineScorer
+from paging import PAGE_SIZES, filter_results, page_count, page_slice, style_page
+from predict import PredictionService
+from pipeline import (
+    COLLECTIONS,
+    DB_NAME,
+    DEFAULT_COSTS,
+    MONGO_URI,
+    load_collections,
+    load_results,
+    summarize,
+)
+from risk import concat_scores, score_frames
+from snapshot import SNAPSHOT_DIR, SnapshotStore
+from telemetry import load_frame
 
 # --- Config ---
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
-DB_NAME = os.getenv("DB_NAME", "digitalTwinsTelemetryDB")
-COLLECTIONS = [
-    "compressor1",
-    "drillrig1",
-    "pipeline1",
-    "refinery1",
-    "retail1",
-    "transformer1",
-    "turbine1",
-    "wellhead1",
-]
-
-DEFAULT_COSTS = {
-    "compressor1": {"revenue_per_hour": 41500.0, "maintenance_base": 207500.0},  # $500 = ₹41,500, $2500 = ₹207,500
-    "drillrig1": {"revenue_per_hour": 99600.0, "maintenance_base": 664000.0},    # $1200 = ₹99,600, $8000 = ₹664,000
-    "turbine1": {"revenue_per_hour": 124500.0, "maintenance_base": 830000.0},    # $1500 = ₹124,500, $10000 = ₹830,000
-    "pipeline1": {"revenue_per_hour": 58100.0, "maintenance_base": 332000.0},    # $700 = ₹58,100, $4000 = ₹332,000
-    "refinery1": {"revenue_per_hour": 166000.0, "maintenance_base": 1245000.0},  # $2000 = ₹166,000, $15000 = ₹1,245,000
-    "retail1": {"revenue_per_hour": 24900.0, "maintenance_base": 124500.0},      # $300 = ₹24,900, $1500 = ₹124,500
-    "transformer1": {"revenue_per_hour": 49800.0, "maintenance_base": 415000.0}, # $600 = ₹49,800, $5000 = ₹415,000
-    "wellhead1": {"revenue_per_hour": 37350.0, "maintenance_base": 249000.0},    # $450 = ₹37,350, $3000 = ₹249,000
+CACHE_TTL = float(os.getenv("CACHE_TTL", "30"))
+CACHE_MAX_AGE_HOURS = float(os.getenv("CACHE_MAX_AGE_HOURS", "0"))
+ONLINE_DECAY = float(os.getenv("ONLINE_DECAY", "0"))
+ONLINE_STATE_PATH = os.getenv("ONLINE_STATE_PATH", "")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+COMPACT_FRAMES = os.getenv("COMPACT_FRAMES", "0") == "1"
+LIVE_REFRESH_SECONDS = float(os.getenv("LIVE_REFRESH_SECONDS", "1"))
+INDEX_CHECK = os.getenv("INDEX_CHECK", "1") == "1"
+ENSURE_INDEXES = os.getenv("ENSURE_INDEXES", "0") == "1"
+
+# Healthy-asset cards and medium/high detail panels rendered per page
+CARDS_PER_PAGE = 30
+PANELS_PER_PAGE = 10
+
+FAILURE_TYPES = {
+    "drillrig1": ["Mechanical Wear", "Bearing Failure", "Hydraulic System"],
+    "wellhead1": ["Pressure Valve Failure", "Seal Degradation", "Flow Control Issue"],
+    "pipeline1": ["Corrosion", "Leak", "Pressure Drop"],
+    "compressor1": ["Motor Failure", "Overheating", "Energy Inefficiency"],
+    "refinery1": ["Heat Exchanger Failure", "Catalyst Degradation", "Process Upset"],
+    "retail1": ["Pump Failure", "Tank Leak", "Dispenser Malfunction"],
+    "turbine1": ["Blade Damage", "Vibration Excess", "Bearing Wear"],
+    "transformer1": ["Insulation Breakdown", "Overheating", "Voltage Fluctuation"]
 }
 
+logger = logging.getLogger("pm.dashboard")
+
 
 # --- Helpers ---
 @st.cache_resource(show_spinner=False)
@@ -44,99 +67,101 @@ def get_mongo_client(uri: str):
     return MongoClient(uri)
 
 
-def load_docs(client: MongoClient, db_name: str, coll: str, limit: int = 1000) -> List[Dict[str, Any]]:
-    db = client[db_name]
-    cursor = db[coll].find({}).sort("ts", -1).limit(limit)
-    return list(cursor)
+@st.cache_resource(show_spinner=False)
+def get_telemetry_cache(uri: str, db_name: str, compact: bool = False) -> TelemetryCache:
+    return TelemetryCache(
+        get_mongo_client(uri), db_name, max_rows=5000, max_age_hours=CACHE_MAX_AGE_HOURS, ttl=CACHE_TTL, compact=compact
+    )
+
+
+@st.cache_resource(show_spinner=False)
+def get_online_scorer(uri: str, db_name: str) -> OnlineScorer:
+    if ONLINE_STATE_PATH:
+        return OnlineScorer.load(ONLINE_STATE_PATH, decay=ONLINE_DECAY)
+    return OnlineScorer(decay=ONLINE_DECAY)
+
+
+@st.cache_resource(show_spinner=False)
+def get_live_ingest(uri: str, db_name: str) -> IngestWorker:
+    # One background worker per database, feeding the shared online scorer
+    worker = IngestWorker(get_mongo_client(uri), db_name, COLLECTIONS, get_online_scorer(uri, db_name), LiveRiskStore())
+    worker.start()
+    return worker
+
+
+@st.experimental_fragment(run_every=LIVE_REFRESH_SECONDS)
+def live_risk_panel(worker: IngestWorker, colls):
+    # Re-renders on its own timer from the in-memory store; never queries Mongo
+    status = worker.status()
+    st.subheader("⚡ Live Risk")
+    lag = f"{status['p50LagMs']} ms" if status["p50LagMs"] is not None else "n/a"
+    st.caption(f"Source: {status['mode']} • {status['events']} point(s) scored • median ingest lag {lag}")
+    if status["lastError"]:
+        st.warning(f"Ingest error: {status['lastError']}")
+    live_df = worker.store.risk_frame(colls)
+    if live_df.empty:
+        st.info("Waiting for new telemetry...")
+        return
+    st.dataframe(live_df.drop(columns=["updatedAt"]).round({"onlineRisk": 3}), use_container_width=True, hide_index=True)
+
+
+@st.cache_resource(show_spinner=False)
+def get_rolling_features(uri: str, db_name: str) -> RollingFeatures:
+    # Shared across reruns and sessions so each rerun only computes features for new rows
+    return RollingFeatures()
+
+
+@st.cache_resource(show_spinner=False)
+def get_prediction_service() -> PredictionService:
+    # Models load once per process; results are memoized per model and data version
+    return PredictionService()
 
 
-def to_df(docs: List[Dict[str, Any]]) -> pd.DataFrame:
-    if not docs:
+@st.cache_resource(show_spinner=False)
+def get_index_report(uri: str, db_name: str) -> pd.DataFrame:
+    # Once per process: plan the hot queries (and create missing indexes if ENSURE_INDEXES=1)
+    try:
+        return check_indexes(get_mongo_client(uri), db_name, COLLECTIONS, create=ENSURE_INDEXES)
+    except Exception as e:  # advisory only; never block the dashboard
+        logger.warning("index check failed: %s", e)
         return pd.DataFrame()
-    df = pd.DataFrame(docs)
-    # Normalize timestamp column to pandas datetime
-    if "ts" in df.columns:
-        try:
-            df["ts"] = pd.to_datetime(df["ts"], errors="coerce")
-        except Exception:
-            pass
-    # Drop non-feature columns we won't train on
-    drop_cols = [c for c in ["_id", "status"] if c in df.columns]
-    df = df.drop(columns=drop_cols, errors="ignore")
-    # Keep numeric columns only (exclude sales); we will also carry ts separately
-    num_df = df.select_dtypes(include=[np.number]).copy()
-    for c in list(num_df.columns):
-        lc = str(c).lower()
-        if lc in ("sales", "lastsales"):
-            num_df.drop(columns=[c], inplace=True, errors="ignore")
-    # Add twinId if present (not as feature but to group/report)
-    if "twinId" in df.columns:
-        num_df["twinId"] = df["twinId"]
-    # Carry timestamp for time-series plots
-    if "ts" in df.columns:
-        num_df["ts"] = df["ts"]
-    return num_df
-
-
-def build_labels(features: pd.DataFrame) -> pd.Series:
-    # Unsup proxy: mark as 1 (at-risk) if any z-score > 3 or < -3 across metrics for that row
-    feat_only = features.select_dtypes(include=[np.number]).drop(columns=[c for c in ("twinId",) if c in features.columns], errors="ignore")
-    if feat_only.empty:
-        return pd.Series([0] * len(features), index=features.index)
-    z = (feat_only - feat_only.mean()) / (feat_only.std(ddof=0).replace(0, 1))
-    risky = (np.abs(z) > 3).any(axis=1).astype(int)
-    return risky
-
-
-def train_model(features: pd.DataFrame, labels: pd.Series):
-    """Train a classifier and return (model, feature_names) used for training.
-
-    Ensures fallback training uses the same number of features as the
-    available numeric columns to avoid n_features mismatch at predict time.
-    """
-    X = features.select_dtypes(include=[np.number]).drop(columns=[c for c in ("twinId",) if c in features.columns], errors="ignore")
-    y = labels
-    feature_names = list(X.columns)
-    # If there are no numeric features, create a dummy single feature
-    if X.shape[1] == 0:
-        feature_names = ["f0"]
-    if X.empty or len(np.unique(y)) == 1:
-        # Fallback classifier with synthetic variability, matching feature width
-        n_features = max(1, len(feature_names))
-        model = RandomForestClassifier(n_estimators=50, random_state=42)
-        X_syn_np = np.random.randn(max(20, len(X) or 20), n_features)
-        # Fit using a DataFrame with explicit column names to avoid sklearn warnings
-        X_syn = pd.DataFrame(X_syn_np, columns=[f for f in feature_names])
-        y_syn = np.random.randint(0, 2, size=X_syn.shape[0])
-        model.fit(X_syn, y_syn)
-        return model, feature_names
-    
-    # Check if we have enough samples for stratified split
-    min_class_count = min(np.bincount(y))
-    if min_class_count < 2:
-        # Not enough samples for stratified split, use regular split
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.25, random_state=42)
-    else:
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.25, random_state=42, stratify=y)
-    model = RandomForestClassifier(n_estimators=200, max_depth=None, random_state=42, n_jobs=-1)
-    model.fit(X_train, y_train)
-    return model, feature_names
-
-
-def estimate_costs(prob: float, coll: str, hours_horizon: float) -> Dict[str, float]:
-    cfg = DEFAULT_COSTS.get(coll, {"revenue_per_hour": 500.0, "maintenance_base": 2500.0})
-    rev_per_hr = float(cfg["revenue_per_hour"])
-    maint_base = float(cfg["maintenance_base"])
-    # Assume expected downtime hours scales with probability over the horizon
-    expected_downtime = hours_horizon * prob * 0.25
-    revenue_loss = expected_downtime * rev_per_hr
-    # Maintenance cost increases with probability
-    maintenance_cost = maint_base * (0.5 + 1.5 * prob)
-    return {
-        "expected_downtime_hours": round(expected_downtime, 2),
-        "revenue_loss": round(revenue_loss, 2),
-        "maintenance_cost": round(maintenance_cost, 2),
-    }
+
+
+@st.cache_resource(show_spinner=False)
+def get_snapshot_store(root: str) -> SnapshotStore:
+    return SnapshotStore(root)
+
+
+@st.cache_resource(show_spinner=False)
+def get_metrics_server(port: int):
+    # One /metrics endpoint per process, shared by all sessions
+    return start_metrics_server(port)
+
+
+def page_picker(rows: int, page_size: int, key: str) -> int:
+    """1-based page number; the input is only shown when there is more than one page."""
+    pages = page_count(rows, page_size)
+    if pages == 1:
+        return 1
+    # Keyed by page count so a shrinking result set starts again at page 1
+    return int(st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1, key=f"{key}_{pages}"))
+
+
+def metric_stats_table(metric_stats, asset) -> None:
+    """Window mean/std/count per metric of ``asset`` (server-side mode only)."""
+    stats = metric_stats.get(asset["collection"])
+    if stats is None or stats.empty:
+        return
+    rows = stats[stats["twinId"] == asset["twinId"]].drop(columns="twinId")
+    if not rows.empty:
+        st.markdown("**Metric statistics (window, computed in MongoDB):**")
+        st.dataframe(rows.round(3), use_container_width=True, hide_index=True)
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def cached_risk_png(chart_df: pd.DataFrame) -> bytes:
+    # Keyed on the downsampled frame, i.e. on data version and risk threshold
+    return render_risk_png(chart_df)
 
 
 # --- UI ---
@@ -244,12 +269,27 @@ with st.sidebar:
     
     st.header("📊 Data Configuration")
     selected_collections = st.multiselect("Choose collections", COLLECTIONS, default=COLLECTIONS)
-    limit = st.number_input("Fetch last N docs per collection", min_value=100, max_value=5000, value=1000, step=50)
+    precomputed = st.checkbox("Read precomputed results", value=False, help="Show the latest run written by batch.py instead of scoring live")
+    use_snapshot = bool(SNAPSHOT_DIR) and st.checkbox("Read local snapshot", value=False, help=f"Score telemetry from the snapshot files in {SNAPSHOT_DIR} instead of querying MongoDB")
+    server_side = not use_snapshot and st.checkbox("Server-side aggregation", value=False, help="Compute per-twin statistics and bucketed risk inside MongoDB (5.0+); only summaries are transferred")
+    limit = st.number_input("Fetch last N docs per collection", min_value=100, max_value=1_000_000 if server_side else 5000, value=1000, step=50)
+    if server_side:
+        bucket_unit = st.selectbox("Trend bucket", ["minute", "hour", "day"], index=0)
+    columnar = st.checkbox("Columnar fetch", value=True, help="Project numeric fields only and decode straight into column arrays")
+    use_cache = st.checkbox("Cache between reruns", value=True, disabled=not columnar, help=f"Serve reruns from memory; fetch only documents newer than the cached ones every {CACHE_TTL:.0f}s")
+    compact = st.checkbox("Compact memory", value=COMPACT_FRAMES, help="Hold telemetry as float32 metrics and categorical twin ids (~4 bytes per metric per row)")
+    refresh = st.button("🔄 Refresh data")
     
     st.header("🎯 Analysis Settings")
     horizon_hours = st.slider("Prediction Horizon (hours)", min_value=12, max_value=336, value=72, step=12)
+    online = st.checkbox("Online scoring (Welford)", value=False, help="Score only new points against running per-twin statistics and show the running risk")
+    live = st.checkbox("Live risk (change streams)", value=False, help="Stream new telemetry into running risk scores in the background and refresh them every second without rerunning the page")
+    model_predictions = st.checkbox("Model failure probability", value=False, help="Batched predict_proba of the trained per-collection models (python batch.py --train)")
+    trend_features = st.checkbox("Rolling trend features", value=False, help="Per-twin rolling mean, std, slope and EWMA of each metric, updated incrementally for new rows only")
     min_avg_risk = st.slider("Min Risk Threshold", min_value=0.0, max_value=1.0, value=0.0, step=0.01, help="Filter twins by minimum average risk")
 
+    chart_mode = st.radio("Trend chart", ["Static", "Interactive"], horizontal=True, help="Static renders a cached PNG; Interactive supports zoom and tooltips")
+
     st.header("💰 Cost Configuration")
     cost_overrides = {}
     for coll in selected_collections:
@@ -266,79 +306,114 @@ with st.sidebar:
 
 # Connect
 client = get_mongo_client(mongo_uri)
+if METRICS_PORT:
+    get_metrics_server(METRICS_PORT)
+index_report = get_index_report(mongo_uri, db_name) if INDEX_CHECK else pd.DataFrame()
+run_metrics = RunMetrics()
+
+if live:
+    live_risk_panel(get_live_ingest(mongo_uri, db_name), selected_collections)
+    st.markdown("---")
 
 # Load and predict per collection
-results_rows = []
-summary_rows = []  # average risk per twin for summary scatter
-time_rows = []     # time-series points: {collection, twinId, _ts, risk}
-for coll in selected_collections:
-    with st.spinner(f"Loading {coll}..."):
-        docs = load_docs(client, db_name, coll, limit=limit)
-    df = to_df(docs)
-    if df.empty:
-        st.warning(f"No data for {coll}")
-        continue
-
-    # Group by twinId if present, otherwise single group
-    twins = df["twinId"].dropna().unique().tolist() if "twinId" in df.columns else [None]
-    for twin in twins:
-        if twin is None:
-            subset = df
+frames = {}
+# Per-(twinId, metric) window statistics from MongoDB, server-side mode only
+metric_stats = {}
+# Risk depends only on these inputs; horizon and cost changes reuse the last scores
+scoring_key = (
+    mongo_uri, db_name, tuple(selected_collections), use_snapshot, server_side, limit,
+    bucket_unit if server_side else None, columnar, use_cache, compact,
+)
+scored = st.session_state.get("scored")
+if scored is not None and (scored["key"] != scoring_key or refresh or time.time() - scored["at"] >= CACHE_TTL):
+    scored = None
+if precomputed:
+    with st.spinner("Loading precomputed results..."), run_metrics.stage("load_results") as extra:
+        res_df, summary_df, ts_df, run_id = load_results(client, db_name, selected_collections)
+        extra["docs"] = len(res_df) + len(summary_df) + len(ts_df)
+    risk_summary = res_df[["collection", "twinId", "risk", "severity"]] if not res_df.empty else res_df
+    if run_id is None:
+        st.warning("No precomputed results found. Run `python batch.py` first.")
+    else:
+        st.caption(f"Precomputed run: {run_id}")
+elif scored is not None:
+    risk_summary, ts_df, frames, metric_stats = scored["risk_summary"], scored["ts_df"], scored["frames"], scored["metric_stats"]
+    st.caption(f"Scores from {time.time() - scored['at']:.0f}s ago; costs recomputed for the current settings")
+else:
+    fetch_start = time.perf_counter()
+    # Documents/bytes actually read from Mongo per collection (columnar paths only)
+    fetch_stats = {coll: {} for coll in selected_collections}
+    telemetry_cache = None
+    with st.spinner(f"Loading {len(selected_collections)} collection(s)..."):
+        if use_snapshot:
+            snapshot_store = get_snapshot_store(SNAPSHOT_DIR)
+            fetch = lambda c, d, coll, limit: snapshot_store.load(coll, limit=limit, compact=compact)
+        elif server_side:
+            def fetch(c, d, coll, limit):
+                # The asset panels' per-metric statistics come from the same window, via $group
+                metric_stats[coll] = twin_stats(c, d, coll, limit=limit)
+                return bucket_risk(c, d, coll, limit=limit, unit=bucket_unit)
+        elif columnar and use_cache:
+            telemetry_cache = get_telemetry_cache(mongo_uri, db_name, compact)
+            fetch = lambda c, d, coll, limit: telemetry_cache.get(coll, limit, refresh=refresh, stats=fetch_stats[coll])
+        elif columnar:
+            fetch = lambda c, d, coll, limit: load_frame(c, d, coll, limit=limit, stats=fetch_stats[coll], compact=compact)
         else:
-            subset = df[df["twinId"] == twin]
-        if len(subset) < 30:
+            fetch = None
+        loaded = load_collections(client, db_name, selected_collections, limit=limit, fetch=fetch)
+    fetch_total = time.perf_counter() - fetch_start
+    for coll, (df, secs) in loaded.items():
+        stats = fetch_stats[coll]
+        run_metrics.add("fetch", secs, coll, docs=stats.get("docs", len(df)), bytes=stats.get("bytes"))
+
+    with st.sidebar:
+        with st.expander("⏱️ Fetch Timings"):
+            timing_df = pd.DataFrame(
+                [{"collection": c, "docs": len(d), "seconds": round(t, 3)} for c, (d, t) in loaded.items()],
+                columns=["collection", "docs", "seconds"],
+            )
+            st.dataframe(timing_df, use_container_width=True, hide_index=True)
+            st.caption(f"Wall time: {fetch_total:.3f}s (parallel)")
+            if telemetry_cache is not None:
+                st.caption("Cache")
+                cache_df = pd.DataFrame.from_dict(telemetry_cache.stats(), orient="index")
+                st.dataframe(cache_df, use_container_width=True)
+
+    for coll in selected_collections:
+        df, _ = loaded[coll]
+        if df.empty:
+            st.warning(f"No data for {coll}")
             continue
-        # Compute per-row risk using z-score anomaly proxy for time series
-        X_all = subset.select_dtypes(include=[np.number]).drop(columns=[c for c in ("twinId", "ts") if c in subset.columns], errors="ignore")
-        if X_all.empty:
-            row_risk = pd.Series([0.0] * len(subset), index=subset.index)
+        # Columnar and snapshot fetches are already compact; the document path is converted here
+        frames[coll] = compact_frame(df) if compact and fetch is None else df
+
+    # Z-score risk for every twin of every collection (table and graph use the same score)
+    with run_metrics.stage("score"):
+        if server_side:
+            risk_summary, ts_df = concat_scores([score_buckets(df, coll) for coll, df in frames.items()])
+            frames = {}  # buckets, not telemetry rows
         else:
-            z = (X_all - X_all.mean()) / (X_all.std(ddof=0).replace(0, 1))
-            row_risk = (np.abs(z) > 3).mean(axis=1).fillna(0.0)  # fraction of metrics out-of-band per row
-        # Add to time series rows
-        if "ts" in subset.columns:
-            for ts_val, r_val in zip(subset["ts"], row_risk):
-                if pd.isna(ts_val):
-                    continue
-                time_rows.append({
-                    "collection": coll,
-                    "twinId": twin,
-                    "ts": ts_val,
-                    "risk": float(np.clip(r_val, 0.0, 1.0)),
-                })
-        # Use z-score based risk for both table and graph (consistent)
-        avg_ts_risk = float(np.clip(row_risk.mean() if len(row_risk) else 0.0, 0.0, 1.0))
-        risk = avg_ts_risk  # Use the same z-score risk for table
-        # Severity
-        severity = "high" if risk >= 0.66 else ("medium" if risk >= 0.33 else "low")
-        # Costs
-        costs = estimate_costs(risk, coll, horizon_hours)
-        results_rows.append({
-            "collection": coll,
-            "twinId": twin,
-            "risk": round(risk, 3),
-            "severity": severity,
-            "horizonHours": horizon_hours,
-            **costs,
-        })
-        summary_rows.append({
-            "collection": coll,
-            "twinId": twin,
-            "avgRisk": round(avg_ts_risk, 3),
-        })
+            risk_summary, ts_df = score_frames(frames, compact=compact)
+    st.session_state["scored"] = {
+        "key": scoring_key, "at": time.time(), "risk_summary": risk_summary, "ts_df": ts_df, "frames": frames,
+        "metric_stats": metric_stats,
+    }
+
+if not precomputed:
+    with run_metrics.stage("costs"):
+        res_df, summary_df, ts_df = summarize(risk_summary, ts_df, horizon_hours)
 
 # Display results
-if results_rows:
-    res_df = pd.DataFrame(results_rows)
-    # Sort by severity then risk desc
-    order = {"high": 2, "medium": 1, "low": 0}
-    res_df["sev_order"] = res_df["severity"].map(order)
-    res_df = (
-        res_df
-        .sort_values(["sev_order", "risk"], ascending=[False, False])
-        .drop(columns=["sev_order"]) 
-        .reset_index(drop=True)
-    )
+if not res_df.empty:
+    if online and frames:
+        scorer = get_online_scorer(mongo_uri, db_name)
+        for coll, df in frames.items():
+            with run_metrics.stage("online", coll):
+                scorer.update_frame(coll, df)
+        if ONLINE_STATE_PATH:
+            scorer.save(ONLINE_STATE_PATH)
+        online_df = scorer.risk_frame()[["collection", "twinId", "onlineRisk"]]
+        res_df = res_df.merge(online_df.assign(onlineRisk=online_df["onlineRisk"].round(3)), on=["collection", "twinId"], how="left")
 
     # Summary metrics at top
     col1, col2, col3, col4 = st.columns(4)
@@ -359,18 +434,68 @@ if results_rows:
     st.markdown("---")
     st.subheader("📋 Risk Predictions by Asset")
     
-    # Color code the dataframe with lighter backgrounds and black text
-    def highlight_severity(row):
-        if row['severity'] == 'high':
-            return ['background-color: rgba(239, 68, 68, 0.2); color: #000000'] * len(row)  # Light red with black text
-        elif row['severity'] == 'medium':
-            return ['background-color: rgba(245, 158, 11, 0.2); color: #000000'] * len(row)  # Light orange with black text
-        else:
-            return ['background-color: rgba(34, 197, 94, 0.2); color: #000000'] * len(row)  # Light green with black text
-    
-    styled_df = res_df.style.apply(highlight_severity, axis=1)
-    st.dataframe(styled_df, use_container_width=True)
+    # Filter and paginate server-side; only the visible page is styled and sent to the browser
+    tf1, tf2, tf3, tf4 = st.columns([2, 2, 2, 1])
+    with tf1:
+        table_severities = st.multiselect("Severity", ["high", "medium", "low"], default=["high", "medium", "low"], key="table_severity")
+    with tf2:
+        table_collections = st.multiselect("Collection", sorted(res_df["collection"].unique()), key="table_collections", placeholder="All collections")
+    with tf3:
+        table_risk = st.slider("Risk range", min_value=0.0, max_value=1.0, value=(0.0, 1.0), step=0.01, key="table_risk")
+    with tf4:
+        table_page_size = st.selectbox("Rows per page", PAGE_SIZES, index=1, key="table_page_size")
+    with run_metrics.stage("table") as extra:
+        table_df = filter_results(res_df, table_severities, table_collections or None, table_risk)
+        table_page = page_picker(len(table_df), table_page_size, "table_page")
+        page_df = page_slice(table_df, table_page, table_page_size)
+        extra["rows"] = len(page_df)
+        st.dataframe(style_page(page_df), use_container_width=True)
+        first = (table_page - 1) * table_page_size
+        st.caption(f"Rows {first + 1 if len(page_df) else 0}–{first + len(page_df)} of {len(table_df)} matching ({len(res_df)} twins in total)")
+
+    with st.expander("🧮 What-if: horizon × cost scenarios"):
+        wi1, wi2, wi3 = st.columns(3)
+        with wi1:
+            wi_horizons = st.multiselect("Horizons (hours)", [12, 24, 48, 72, 168, 336], default=[24, 72, 168])
+        with wi2:
+            wi_revenue = st.multiselect("Revenue per hour ×", [0.5, 0.75, 1.0, 1.25, 1.5, 2.0], default=[0.75, 1.0, 1.25])
+        with wi3:
+            wi_maint = st.multiselect("Maintenance base ×", [0.5, 0.75, 1.0, 1.25, 1.5, 2.0], default=[1.0])
+        if wi_horizons and wi_revenue and wi_maint:
+            with run_metrics.stage("what_if"):
+                scenarios = what_if(risk_summary, wi_horizons, wi_revenue, wi_maint, costs=cost_overrides)
+            st.dataframe(scenarios.sort_values("total_cost", ascending=False), use_container_width=True, hide_index=True)
+            st.caption("Uses the current risk scores and the sidebar cost inputs (applied or not); nothing is re-fetched or re-scored.")
+
+    if model_predictions and frames:
+        with st.expander("🤖 Model failure probability", expanded=True):
+            service = get_prediction_service()
+            with run_metrics.stage("predict") as extra:
+                predictions = service.predict_many(frames)
+                extra["rows"] = int(predictions["rows"].sum()) if not predictions.empty else 0
+            if predictions.empty:
+                st.info("No trained models found. Run `python batch.py --train` first.")
+            else:
+                st.dataframe(predictions.round({"failureProb": 3, "latestProb": 3}), use_container_width=True, hide_index=True)
+                cache = service.stats()
+                st.caption(f"Mean and newest-row failure probability per twin; prediction cache {cache['hits']} hit(s), {cache['misses']} miss(es).")
+
+    if trend_features and frames:
+        with st.expander("📈 Rolling trend features"):
+            rolling = get_rolling_features(mongo_uri, db_name)
+            with run_metrics.stage("features") as extra:
+                extra["rows"] = sum(len(rolling.update(coll, frame)) for coll, frame in frames.items())
+            latest = rolling.latest()
+            if not latest.empty:
+                latest = latest[latest["collection"].isin(list(frames))]
+                w = WINDOWS[len(WINDOWS) // 2]
+                shown = ["collection", "twinId", *[c for c in latest.columns if c.endswith((f"_mean_{w}", f"_slope_{w}"))]]
+                st.dataframe(latest[shown].round(3), use_container_width=True, hide_index=True)
+                st.caption(f"Latest {w}-reading mean and slope (per reading) per twin; {extra['rows']} new row(s) processed this rerun.")
     
+    # Severity panels are timed together; ended before the trend charts
+    panels_token = run_metrics.begin("panels")
+
     # Healthy Assets Section (Low Risk)
     healthy_assets = res_df[res_df["severity"] == "low"]
     if not healthy_assets.empty:
@@ -378,27 +503,29 @@ if results_rows:
         st.subheader("✅ Healthy Assets (Low Risk)")
         st.success(f"🎉 {len(healthy_assets)} asset(s) operating within normal parameters")
         
-        # Show healthy assets in a nice grid
-        cols_per_row = 3
-        for i in range(0, len(healthy_assets), cols_per_row):
-            cols = st.columns(cols_per_row)
-            for j, (idx, asset) in enumerate(healthy_assets.iloc[i:i+cols_per_row].iterrows()):
-                with cols[j]:
-                    st.markdown(f"""
-                    <div style="background: linear-gradient(135deg, #064e3b 0%, #065f46 100%); 
-                                padding: 15px; border-radius: 10px; border: 2px solid #10b981;">
-                        <h4 style="color: #86efac; margin: 0;">✅ {asset['twinId']}</h4>
-                        <p style="color: #d1fae5; font-size: 24px; font-weight: bold; margin: 5px 0;">
-                            {asset['risk']:.3f}
-                        </p>
-                        <p style="color: #a7f3d0; font-size: 14px; margin: 0;">
-                            🟢 Operating Normally
-                        </p>
-                        <p style="color: #d1fae5; font-size: 12px; margin: 5px 0 0 0;">
-                            No maintenance required
-                        </p>
-                    </div>
-                    """, unsafe_allow_html=True)
+        # Show one page of healthy assets as a single HTML grid
+        page = page_picker(len(healthy_assets), CARDS_PER_PAGE, "healthy_page")
+        cards = "".join(
+            f"""
+            <div style="background: linear-gradient(135deg, #064e3b 0%, #065f46 100%); 
+                        padding: 15px; border-radius: 10px; border: 2px solid #10b981;">
+                <h4 style="color: #86efac; margin: 0;">✅ {twin}</h4>
+                <p style="color: #d1fae5; font-size: 24px; font-weight: bold; margin: 5px 0;">
+                    {risk:.3f}
+                </p>
+                <p style="color: #a7f3d0; font-size: 14px; margin: 0;">
+                    🟢 Operating Normally
+                </p>
+                <p style="color: #d1fae5; font-size: 12px; margin: 5px 0 0 0;">
+                    No maintenance required
+                </p>
+            </div>"""
+            for twin, risk in page_slice(healthy_assets, page, CARDS_PER_PAGE)[["twinId", "risk"]].itertuples(index=False)
+        )
+        st.markdown(
+            f'<div style="display: grid; grid-template-columns: repeat(3, 1fr); gap: 1rem;">{cards}</div>',
+            unsafe_allow_html=True,
+        )
     
     # Medium Risk Assets - Schedule Maintenance
     medium_risk_assets = res_df[res_df["severity"] == "medium"]
@@ -407,7 +534,9 @@ if results_rows:
         st.subheader("🟡 Assets Requiring Attention (Medium Risk)")
         st.info(f"ℹ️ {len(medium_risk_assets)} asset(s) should be scheduled for preventive maintenance")
         
-        for idx, asset in medium_risk_assets.iterrows():
+        # Detail panels are built for the current page only
+        page = page_picker(len(medium_risk_assets), PANELS_PER_PAGE, "medium_page")
+        for idx, asset in page_slice(medium_risk_assets, page, PANELS_PER_PAGE).iterrows():
             with st.expander(f"🟡 {asset['twinId']} - Risk: {asset['risk']:.3f}"):
                 col_m1, col_m2, col_m3 = st.columns(3)
                 
@@ -430,6 +559,7 @@ if results_rows:
                 - 📊 Monitor trends closely
                 - 📝 Update maintenance logs
                 """)
+                metric_stats_table(metric_stats, asset)
     
     # Failure Prediction for High-Risk Assets
     high_risk_assets = res_df[res_df["severity"] == "high"]
@@ -438,7 +568,8 @@ if results_rows:
         st.subheader("🚨 Failure Prediction for High-Risk Assets")
         st.warning(f"⚠️ {len(high_risk_assets)} asset(s) at high risk of failure")
         
-        for idx, asset in high_risk_assets.iterrows():
+        page = page_picker(len(high_risk_assets), PANELS_PER_PAGE, "high_page")
+        for idx, asset in page_slice(high_risk_assets, page, PANELS_PER_PAGE).iterrows():
             with st.expander(f"🔴 {asset['twinId']} - Risk: {asset['risk']:.3f}", expanded=True):
                 col_f1, col_f2, col_f3 = st.columns(3)
                 
@@ -460,18 +591,7 @@ if results_rows:
                     urgency = "🟡 MODERATE"
                 
                 # Determine likely failure type based on collection
-                failure_types = {
-                    "drillrig1": ["Mechanical Wear", "Bearing Failure", "Hydraulic System"],
-                    "wellhead1": ["Pressure Valve Failure", "Seal Degradation", "Flow Control Issue"],
-                    "pipeline1": ["Corrosion", "Leak", "Pressure Drop"],
-                    "compressor1": ["Motor Failure", "Overheating", "Energy Inefficiency"],
-                    "refinery1": ["Heat Exchanger Failure", "Catalyst Degradation", "Process Upset"],
-                    "retail1": ["Pump Failure", "Tank Leak", "Dispenser Malfunction"],
-                    "turbine1": ["Blade Damage", "Vibration Excess", "Bearing Wear"],
-                    "transformer1": ["Insulation Breakdown", "Overheating", "Voltage Fluctuation"]
-                }
-                
-                likely_failures = failure_types.get(asset['collection'], ["General Equipment Failure"])
+                likely_failures = FAILURE_TYPES.get(asset['collection'], ["General Equipment Failure"])
                 
                 with col_f1:
                     st.metric("💥 Failure Probability", f"{failure_prob:.1f}%")
@@ -497,15 +617,15 @@ if results_rows:
                 - 📞 Alert operations manager
                 - 💰 Estimated cost if failure occurs: ₹{asset['revenue_loss']:,.0f} (revenue loss) + ₹{asset['maintenance_cost']:,.0f} (repairs)
                 """)
+                metric_stats_table(metric_stats, asset)
+
+    run_metrics.end(panels_token)
 
     # Time-series line chart: risk evolution over time per twin (per collection)
-    summary_df = pd.DataFrame(summary_rows) if summary_rows else pd.DataFrame(columns=["collection","twinId","avgRisk"])
     st.markdown("---")
     #st.subheader("📈 Risk Trend Over Time (Time Series)")
     
-    ts_df = pd.DataFrame(time_rows) if time_rows else pd.DataFrame(columns=["collection","twinId","ts","risk"])
     if not ts_df.empty:
-        ts_df = ts_df.dropna(subset=["ts"])  # ensure timestamps exist
         for coll in res_df["collection"].unique():
             # Only include twins that meet the min_avg_risk filter
             all_twins_in_coll = set(ts_df[ts_df["collection"] == coll]["twinId"].astype(str).unique())
@@ -523,39 +643,30 @@ if results_rows:
                 continue
             
             st.markdown(f"### 📈 {coll.title()} • Risk Over Time")
-            # Plot multiple lines by twin
-            fig, ax = plt.subplots(figsize=(11, 4.5), facecolor='#1e293b')
-            ax.set_facecolor('#0f172a')
-            
-            colors_palette = ['#3b82f6', '#8b5cf6', '#ec4899', '#f59e0b', '#10b981', '#06b6d4']
-            for idx, (twin, grp) in enumerate(sub.groupby(sub["twinId"].astype(str))):
-                g = grp.sort_values("ts")
-                color = colors_palette[idx % len(colors_palette)]
-                ax.plot(g["ts"], g["risk"], label=str(twin), linewidth=2.5, alpha=0.9, color=color)
-            
-            ax.set_ylim(0.0, 1.0)
-            ax.set_ylabel("Risk Score", fontsize=11, color='#f1f5f9', fontweight='bold')
-            ax.set_xlabel("Time", fontsize=11, color='#f1f5f9', fontweight='bold')
-            ax.tick_params(colors='#cbd5e1')
-            
-            # Threshold overlays
-            ax.axhline(0.33, color="#f59e0b", linestyle="--", linewidth=2, alpha=0.6, label='Medium Threshold')
-            ax.axhline(0.66, color="#ef4444", linestyle="--", linewidth=2, alpha=0.6, label='High Threshold')
-            
-            ax.grid(True, axis="both", linestyle="--", alpha=0.2, color='#475569')
-            ax.legend(loc="upper left", facecolor='#1e293b', edgecolor='#334155', fontsize=9, labelcolor='#f1f5f9', ncol=3)
-            
-            ax.spines['bottom'].set_color('#475569')
-            ax.spines['top'].set_color('#475569')
-            ax.spines['left'].set_color('#475569')
-            ax.spines['right'].set_color('#475569')
-            
-            plt.tight_layout()
-            st.pyplot(fig, clear_figure=True)
+            with run_metrics.stage("chart", coll):
+                # Downsample each twin to the pixel budget; the PNG is cached on the reduced frame
+                chart_df = downsample_series(sub)
+                if chart_mode == "Interactive":
+                    st.altair_chart(risk_chart_altair(chart_df), use_container_width=True)
+                else:
+                    st.image(cached_risk_png(chart_df), use_column_width=True)
 
 else:
     st.info("ℹ️ No results to display. Try increasing the data limit or selecting more collections.")
 
+REGISTRY.observe(run_metrics)
+logger.info("rerun %s", run_metrics.log_line())
+with st.expander("🐞 Debug: stage metrics"):
+    stage_df = run_metrics.frame()
+    st.dataframe(stage_df.round({"seconds": 4, "rss_delta_mb": 2}), use_container_width=True, hide_index=True)
+    st.code(run_metrics.log_line(), language="text")
+    if METRICS_PORT:
+        st.caption(f"Cumulative Prometheus metrics at http://localhost:{METRICS_PORT}/metrics")
+    if not index_report.empty:
+        missing = int((~index_report["present"]).sum())
+        st.caption(f"Index check: {missing} recommended index(es) missing (run `python indexes.py --create`)")
+        st.dataframe(index_report, use_container_width=True, hide_index=True)
+
 st.markdown("---")
 col_a, col_b = st.columns([3, 1])
 with col_a:
@@ -0,0 +1,143 @@
+"""Headless batch scoring.
+
+Runs the dashboard pipeline over all (or selected) collections and writes the
+risk table and time series to Mongo or Parquet, e.g. from cron:
+
+    python batch.py --limit 5000 --horizon 72
+    python batch.py --sink parquet --output ./pm_results
+    python batch.py --train   # also refresh the per-collection model registry
+    python batch.py --workers 32 --train   # fan out per collection across processes
+    python batch.py --train --features     # train on rolling-window trend features too
+    python batch.py --shards 8 --workers 8  # hash twins into 8 shards, one process each
+    python batch.py --snapshot snapshots --since 2026-01-01 --limit 5000000   # offline, from snapshot.py files
+"""
+import argparse
+import time
+
+import pandas as pd
+from pymongo import MongoClient
+
+from pipeline import (
+    COLLECTIONS,
+    DB_NAME,
+    MONGO_URI,
+    RESULTS_COLLECTION,
+    run_pipeline,
+    write_results_mongo,
+    write_results_parquet,
+)
+from registry import MODEL_DIR, ModelRegistry
+from features import add_features
+from scheduler import run_parallel
+from shard import run_sharded
+from snapshot import SnapshotStore
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Score all twins and store predictive-maintenance results.")
+    parser.add_argument("--mongo-uri", default=MONGO_URI)
+    parser.add_argument("--db", default=DB_NAME)
+    parser.add_argument("--collections", nargs="+", default=COLLECTIONS, metavar="COLL")
+    parser.add_argument("--limit", type=int, default=1000, help="last N docs per collection")
+    parser.add_argument("--horizon", type=float, default=72, help="prediction horizon in hours")
+    parser.add_argument("--sink", choices=["mongo", "parquet"], default="mongo")
+    parser.add_argument("--output", default="pm_results", help="output directory for --sink parquet")
+    parser.add_argument("--no-columnar", action="store_true", help="use the full-document fetch path")
+    parser.add_argument("--train", action="store_true", help="train models whose schema changed or data drifted")
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--features", action="store_true", help="with --train: add rolling mean/std/slope/EWMA features per twin")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes (one collection per task); 1 runs in-process")
+    parser.add_argument("--compact", action="store_true", help="hold telemetry as float32/categorical columns to cut memory")
+    parser.add_argument("--shards", type=int, default=1, help="hash (collection, twinId) into N shards scored in separate processes (--limit is still the newest N docs per collection)")
+    parser.add_argument("--snapshot", metavar="DIR", help="score telemetry from a snapshot.py directory instead of Mongo")
+    parser.add_argument("--since", help="with --snapshot: read rows at or after this date/timestamp")
+    parser.add_argument("--until", help="with --snapshot: read rows at or before this timestamp")
+    args = parser.parse_args(argv)
+    if args.snapshot and args.workers > 1:
+        parser.error("--snapshot scores in-process; drop --workers")
+    if (args.since or args.until) and not args.snapshot:
+        parser.error("--since/--until require --snapshot")
+    if args.shards > 1 and (args.snapshot or args.train):
+        parser.error("--shards scores from Mongo without training; drop --snapshot/--train")
+    if args.features and not args.train:
+        parser.error("--features requires --train")
+
+    client = MongoClient(args.mongo_uri)
+    start = time.perf_counter()
+    if args.shards > 1:
+        output = run_sharded(
+            args.mongo_uri,
+            args.db,
+            args.collections,
+            args.shards,
+            limit=args.limit,
+            horizon_hours=args.horizon,
+            max_workers=args.workers if args.workers > 1 else None,
+            compact=args.compact,
+        )
+    elif args.workers > 1:
+        output = run_parallel(
+            args.mongo_uri,
+            args.db,
+            args.collections,
+            limit=args.limit,
+            horizon_hours=args.horizon,
+            columnar=not args.no_columnar,
+            model_dir=args.model_dir if args.train else None,
+            max_workers=args.workers,
+            compact=args.compact,
+            features=args.features,
+        )
+    else:
+        fetch = None
+        if args.snapshot:
+            store = SnapshotStore(args.snapshot)
+            fetch = lambda c, d, coll, limit: store.load(coll, limit=limit, start=args.since, end=args.until)
+        output = run_pipeline(
+            client,
+            args.db,
+            args.collections,
+            limit=args.limit,
+            horizon_hours=args.horizon,
+            columnar=not args.no_columnar,
+            compact=args.compact,
+            fetch=fetch,
+        )
+    elapsed = time.perf_counter() - start
+    res_df = output["results"]
+    print(f"Scored {len(res_df)} twin(s) across {len(args.collections)} collection(s) in {elapsed:.2f}s")
+    if not res_df.empty:
+        print(res_df["severity"].value_counts().to_string())
+
+    if args.sink == "mongo":
+        run_id = write_results_mongo(client, args.db, output)
+        print(f"Wrote run {run_id} to {args.db}.{RESULTS_COLLECTION}")
+    else:
+        write_results_parquet(output, args.output)
+        print(f"Wrote results to {args.output}")
+
+    if args.train and args.workers > 1:
+        for task in output["tasks"].to_dict("records"):
+            version = task.get("model_version")
+            if version is None or pd.isna(version):
+                print(f"{task['collection']}: not trained ({task.get('model_reason') or 'no data'})")
+            elif task.get("model_synthetic") is True:
+                print(f"{task['collection']}: no usable labels ({task['model_reason']}), fallback model not saved")
+            else:
+                reason = task.get("model_reason")
+                status = f"trained ({reason})" if pd.notna(reason) and reason else "up to date"
+                print(f"{task['collection']}: model v{int(version)} {status}")
+    elif args.train:
+        registry = ModelRegistry(args.model_dir)
+        for coll, frame in output["frames"].items():
+            _, meta, reason = registry.get_or_train(coll, add_features(frame) if args.features else frame)
+            if meta.get("synthetic"):
+                print(f"{coll}: no usable labels ({reason}), fallback model not saved")
+                continue
+            status = f"trained ({reason})" if reason else "up to date"
+            print(f"{coll}: model v{meta['version']} {status}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,266 @@
+"""Predictive-maintenance pipeline benchmarks.
+
+Seeds a database with synthetic telemetry (``synthetic.py``), then times each
+pipeline stage over all collections and writes a JSON report with latency,
+throughput and peak traced memory per stage. Runs against an in-process
+``mongomock`` database by default, or a real server with ``--mongo-uri``
+(use a scratch database: it is dropped and reseeded). On mongomock the
+columnar fetch reads raw batches through ``synthetic.mongomock_client``'s
+shim, so ``load_columnar`` includes BSON encoding that a server would do.
+
+    python bench.py --twins 20 --points 500 --output bench.json
+    python bench.py --baseline bench.json --tolerance 0.2   # exit 1 on regressions
+    python bench.py --imports --no-train --output bench.json  # also time cold imports
+
+``--imports`` adds ``import:<module>`` stages: the cold import time of each
+dashboard module (and ``import:app``, everything ``app.py`` imports) measured
+in a fresh interpreter, with the heavy optional libraries it pulled in.
+"""
+import argparse
+import ast
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from charts import downsample_series, render_risk_png
+from features import RollingFeatures, add_features
+from pipeline import build_labels, load_docs, score, to_df, train_model
+from synthetic import SCHEMAS, mongomock_client, seed_database
+from telemetry import load_frame
+
+
+def measure(fn: Callable[[], Any], repeat: int) -> Tuple[Dict[str, float], Any]:
+    """Time ``fn`` ``repeat`` times, then once more under tracemalloc for its peak."""
+    times = []
+    result = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "min_s": min(times),
+        "median_s": statistics.median(times),
+        "max_s": max(times),
+        "peak_mb": peak / 2**20,
+    }, result
+
+
+# Libraries that should only load when their feature is used
+HEAVY_MODULES = ["sklearn", "matplotlib", "pyarrow", "pymongoarrow"]
+IMPORT_MODULES = ["pipeline", "risk", "telemetry", "charts", "snapshot", "ingest", "paging"]
+
+_IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+for name in sys.argv[2:]:
+    __import__(name)
+elapsed = time.perf_counter() - start
+print(json.dumps({"s": elapsed, "heavy": [m for m in json.loads(sys.argv[1]) if m in sys.modules]}))
+"""
+
+
+def app_imports(path: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")) -> List[str]:
+    """Top-level modules imported by ``app.py`` (without running the Streamlit script)."""
+    with open(path) as f:
+        tree = ast.parse(f.read())
+    names = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.append(node.module)
+    return list(dict.fromkeys(names))
+
+
+def measure_import(modules: List[str], repeat: int) -> Dict[str, Any]:
+    """Cold import time of ``modules`` in ``repeat`` fresh interpreters."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    times, heavy = [], []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", _IMPORT_PROBE, json.dumps(HEAVY_MODULES), *modules],
+            cwd=here,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        probe = json.loads(out.stdout.strip().splitlines()[-1])
+        times.append(probe["s"])
+        heavy = probe["heavy"]
+    return {"min_s": min(times), "median_s": statistics.median(times), "max_s": max(times), "heavy_modules": heavy}
+
+
+def run_import_benchmarks(repeat: int) -> Dict[str, Dict[str, Any]]:
+    stages: Dict[str, Dict[str, Any]] = {}
+    targets = {f"import:{m}": [m] for m in IMPORT_MODULES}
+    targets["import:app"] = app_imports()
+    for name, modules in targets.items():
+        stats = measure_import(modules, repeat)
+        stages[name] = stats
+        heavy = ", ".join(stats["heavy_modules"]) or "-"
+        print(f"{name:<16} {stats['median_s'] * 1000:9.1f} ms  heavy: {heavy}")
+    return stages
+
+
+def run_benchmarks(client, db_name: str, colls: List[str], limit: int, repeat: int, train: bool) -> Dict[str, Dict[str, Any]]:
+    stages: Dict[str, Dict[str, Any]] = {}
+
+    def record(name: str, fn: Callable[[], Any], rows: Any) -> Any:
+        # rows: row count, or a callable deriving it from the stage's result
+        try:
+            stats, result = measure(fn, repeat)
+        except NotImplementedError as e:  # an operation the backend lacks
+            stages[name] = {"skipped": str(e)}
+            print(f"{name:<14} skipped (not supported by this backend): {e}")
+            return None
+        rows = rows(result) if callable(rows) else rows
+        stats["rows"] = rows
+        stats["rows_per_s"] = rows / stats["median_s"] if stats["median_s"] > 0 else None
+        stages[name] = stats
+        print(f"{name:<14} {stats['median_s'] * 1000:9.1f} ms  {stats['peak_mb']:8.1f} MB peak  ({rows} rows)")
+        return result
+
+    docs = record(
+        "load_docs", lambda: {c: load_docs(client, db_name, c, limit=limit) for c in colls}, lambda r: sum(map(len, r.values()))
+    )
+    rows = sum(len(d) for d in docs.values())
+
+    frames = record("to_df", lambda: {c: to_df(d) for c, d in docs.items()}, rows)
+    record("load_columnar", lambda: {c: load_frame(client, db_name, c, limit=limit) for c in colls}, rows)
+    frames = {c: df for c, df in frames.items() if not df.empty}
+    scored = record("score", lambda: score(frames, 72), rows)
+    record("build_labels", lambda: {c: build_labels(df) for c, df in frames.items()}, rows)
+    record("features", lambda: {c: add_features(df) for c, df in frames.items()}, rows)
+
+    def primed_features() -> Tuple[RollingFeatures, Dict[str, pd.DataFrame]]:
+        # State primed on the older 90% of each window; the full frames then add only the newest 10%
+        rolling = RollingFeatures()
+        for c, df in frames.items():
+            rolling.update(c, df[df["ts"] <= df["ts"].quantile(0.9)])
+        return rolling, frames
+
+    if all("ts" in df.columns for df in frames.values()):
+        times = []
+        for _ in range(repeat):
+            rolling, full = primed_features()
+            start = time.perf_counter()
+            n_new = sum(len(rolling.update(c, df)) for c, df in full.items())
+            times.append(time.perf_counter() - start)
+        median = statistics.median(times)
+        stages["features_incremental"] = {
+            "min_s": min(times),
+            "median_s": median,
+            "max_s": max(times),
+            "rows": n_new,
+            "rows_per_s": n_new / median if median > 0 else None,
+        }
+        print(f"{'features_incr':<14} {median * 1000:9.1f} ms  ({n_new} new rows)")
+    if train:
+        labels = {c: build_labels(df) for c, df in frames.items()}
+        record("train_model", lambda: {c: train_model(df, labels[c]) for c, df in frames.items()}, rows)
+
+    res_df, _, ts_df = scored
+    first = res_df["collection"].iloc[0] if not res_df.empty else None
+    if first is not None:
+        sub = ts_df[ts_df["collection"] == first]
+        record("chart", lambda: render_risk_png(downsample_series(sub)), len(sub))
+    return stages
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Stages whose median latency grew by more than ``tolerance`` versus ``baseline``."""
+    regressions = []
+    for name, new in report["stages"].items():
+        old = baseline.get("stages", {}).get(name)
+        if not old or "median_s" not in old or "median_s" not in new:
+            continue
+        if new["median_s"] > old["median_s"] * (1 + tolerance):
+            regressions.append(f"{name}: {old['median_s'] * 1000:.1f} ms -> {new['median_s'] * 1000:.1f} ms")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the predictive-maintenance pipeline on synthetic telemetry.")
+    parser.add_argument("--mongo-uri", help="benchmark against this server instead of mongomock")
+    parser.add_argument("--db", default="pmBenchmarkDB")
+    parser.add_argument("--collections", nargs="+", default=list(SCHEMAS), metavar="COLL")
+    parser.add_argument("--twins", type=int, default=10, help="twins per collection")
+    parser.add_argument("--points", type=int, default=500, help="readings per twin")
+    parser.add_argument("--limit", type=int, help="docs fetched per collection (default: all)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-train", action="store_true", help="skip the train_model stage")
+    parser.add_argument("--imports", action="store_true", help="also time cold module imports")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--baseline", help="earlier JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed median slowdown before flagging")
+    args = parser.parse_args(argv)
+
+    if args.mongo_uri:
+        from pymongo import MongoClient
+
+        client, backend = MongoClient(args.mongo_uri), "mongod"
+    else:
+        client, backend = mongomock_client(), "mongomock"
+        print("mongomock: load_columnar reads raw batches through a BSON-encoding shim, so it includes encode time")
+    limit = args.limit or args.twins * args.points
+    import_stages = run_import_benchmarks(args.repeat) if args.imports else {}
+    seed_database(client, args.db, twins=args.twins, points=args.points, collections=args.collections, seed=args.seed)
+    print(f"Seeded {len(args.collections)} collection(s) x {args.twins} twin(s) x {args.points} point(s) on {backend}")
+
+    report = {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(),
+            "backend": backend,
+            "collections": args.collections,
+            "twins": args.twins,
+            "points": args.points,
+            "limit": limit,
+            "repeat": args.repeat,
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+        },
+        "stages": {
+            **import_stages,
+            **run_benchmarks(client, args.db, args.collections, limit, args.repeat, train=not args.no_train),
+        },
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for key in ("backend", "collections", "twins", "points", "limit"):
+            if baseline.get("meta", {}).get(key) != report["meta"][key]:
+                print(f"WARNING baseline {key} differs ({baseline.get('meta', {}).get(key)} vs {report['meta'][key]})")
+        regressions = compare(report, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,159 @@
+"""In-process incremental telemetry cache.
+
+Keeps the newest window of each collection as a columnar DataFrame. A sync
+asks Mongo only for documents whose ``ts`` is newer than the newest cached
+one, prepends them, then evicts by row count and age. Between syncs (within
+``ttl`` seconds) reads are served from memory without touching the database.
+"""
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+from pymongo import MongoClient
+
+from compact import bytes_per_row, compact_frame
+from telemetry import columns_to_df, discover_fields, load_columns
+
+
+class _Window:
+    """Cached newest-first rows of one collection."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.df = pd.DataFrame()
+        self.schema: Dict[str, str] = {}
+        self.depth = 0           # limit used for the last full load
+        self.last_ts: Any = None  # newest raw ts value, as stored in Mongo
+        self.synced_at = 0.0
+        self.last_delta = 0
+        self.db_reads = 0
+
+
+def _newest_raw_ts(ts: np.ndarray) -> Any:
+    # Columns come back sorted by ts descending, nulls last
+    for val in ts:
+        if val is None or (isinstance(val, float) and np.isnan(val)):
+            continue
+        if isinstance(val, np.datetime64):
+            if np.isnat(val):
+                continue
+            return pd.Timestamp(val).to_pydatetime()
+        return val
+    return None
+
+
+class TelemetryCache:
+    """Per-collection ring buffer of recent telemetry with ``ts``-delta refresh.
+
+    ``max_rows`` bounds each window; ``max_age_hours`` (0 disables) drops rows
+    older than the newest cached ``ts`` minus that age. ``compact`` keeps
+    windows in the ``compact.compact_frame`` layout.
+    """
+
+    def __init__(
+        self,
+        client: MongoClient,
+        db_name: str,
+        max_rows: int = 5000,
+        max_age_hours: float = 0.0,
+        ttl: float = 30.0,
+        compact: bool = False,
+    ):
+        self.client = client
+        self.db_name = db_name
+        self.max_rows = max_rows
+        self.max_age_hours = max_age_hours
+        self.ttl = ttl
+        self.compact = compact
+        self._windows: Dict[str, _Window] = {}
+        self._lock = threading.Lock()
+
+    def _window(self, coll: str) -> _Window:
+        with self._lock:
+            return self._windows.setdefault(coll, _Window())
+
+    def get(self, coll: str, limit: int = 1000, refresh: bool = False, stats: Optional[Dict[str, int]] = None) -> pd.DataFrame:
+        """Return the newest ``limit`` rows of ``coll`` shaped like ``to_df`` output.
+
+        Reads Mongo only when the window is stale (older than ``ttl``), when
+        ``refresh`` is set, or when ``limit`` exceeds what has been loaded.
+        ``stats`` receives the documents/bytes actually fetched (see ``load_columns``).
+        """
+        win = self._window(coll)
+        with win.lock:
+            limit = min(limit, self.max_rows)
+            if limit > win.depth:
+                self._reload(coll, win, limit, stats)
+            elif refresh or time.time() - win.synced_at >= self.ttl:
+                self._sync(coll, win, stats)
+            return win.df.head(limit)
+
+    def _reload(self, coll: str, win: _Window, limit: int, stats: Optional[Dict[str, int]] = None) -> None:
+        win.schema = discover_fields(self.client, self.db_name, coll)
+        cols = load_columns(self.client, self.db_name, coll, limit=limit, schema=win.schema, stats=stats)
+        win.db_reads += 2
+        win.df = columns_to_df(cols, compact=self.compact)
+        win.last_ts = _newest_raw_ts(cols["ts"]) if "ts" in cols else None
+        win.depth = limit
+        win.last_delta = len(win.df)
+        win.synced_at = time.time()
+        self._evict(win)
+
+    def _sync(self, coll: str, win: _Window, stats: Optional[Dict[str, int]] = None) -> None:
+        if win.last_ts is None or not win.schema:
+            self._reload(coll, win, win.depth, stats)
+            return
+        cols = load_columns(
+            self.client,
+            self.db_name,
+            coll,
+            limit=self.max_rows,
+            schema=win.schema,
+            query={"ts": {"$gt": win.last_ts}},
+            stats=stats,
+        )
+        win.db_reads += 1
+        delta = columns_to_df(cols, compact=self.compact)
+        win.last_delta = len(delta)
+        win.synced_at = time.time()
+        if delta.empty:
+            return
+        win.last_ts = _newest_raw_ts(cols["ts"])
+        win.df = pd.concat([delta, win.df], ignore_index=True)
+        if self.compact:
+            # concat falls back to object dtype when twin categories differ
+            win.df = compact_frame(win.df)
+        self._evict(win)
+
+    def _evict(self, win: _Window) -> None:
+        df = win.df
+        if len(df) > self.max_rows:
+            df = df.iloc[: self.max_rows]
+        if self.max_age_hours > 0 and "ts" in df.columns and not df.empty:
+            cutoff = df["ts"].max() - pd.Timedelta(hours=self.max_age_hours)
+            df = df[df["ts"] >= cutoff]
+        win.df = df.reset_index(drop=True)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-collection cache state for display."""
+        with self._lock:
+            windows = dict(self._windows)
+        return {
+            coll: {
+                "rows": len(win.df),
+                "bytesPerRow": round(bytes_per_row(win.df), 1),
+                "lastDelta": win.last_delta,
+                "dbReads": win.db_reads,
+                "ageSeconds": round(time.time() - win.synced_at, 1) if win.synced_at else None,
+            }
+            for coll, win in windows.items()
+        }
+
+    def clear(self, coll: Optional[str] = None) -> None:
+        with self._lock:
+            if coll is None:
+                self._windows.clear()
+            else:
+                self._windows.pop(coll, None)
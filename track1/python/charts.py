@@ -0,0 +1,112 @@
+"""Risk trend chart rendering.
+
+Each twin's risk series is downsampled to the chart's pixel budget before
+plotting (LTTB keeps the visual shape, including spikes), and charts are drawn
+on a standalone matplotlib ``Figure`` (no pyplot global state) into PNG bytes
+that callers can cache. ``risk_chart_altair`` is the lightweight interactive
+alternative. matplotlib and altair are imported on first use.
+"""
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+from risk import HIGH_RISK, MEDIUM_RISK
+
+# Points kept per twin; the static chart is ~1100 px wide
+CHART_MAX_POINTS = int(os.getenv("CHART_MAX_POINTS", "1000"))
+PALETTE = ['#3b82f6', '#8b5cf6', '#ec4899', '#f59e0b', '#10b981', '#06b6d4']
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: indices of ``n_out`` points that preserve the shape of (x, y).
+
+    ``x`` must be sorted. First and last points are always kept.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            nxt = slice(edges[i + 1], edges[i + 2])
+            avg_x, avg_y = x[nxt].mean(), y[nxt].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area)) if hi > lo else lo
+        out[i + 1] = a
+    return out
+
+
+def downsample_series(sub: pd.DataFrame, max_points: int = CHART_MAX_POINTS) -> pd.DataFrame:
+    """Per-twin LTTB downsampling of a (twinId, ts, risk) frame.
+
+    Returns columns twinId (as str), ts, risk sorted by twin then time.
+    """
+    if sub.empty:
+        return pd.DataFrame(columns=["twinId", "ts", "risk"])
+    df = pd.DataFrame({
+        "twinId": sub["twinId"].astype(str).to_numpy(),
+        "ts": pd.to_datetime(sub["ts"]).to_numpy(),
+        "risk": sub["risk"].astype(float).to_numpy(),
+    }).sort_values(["twinId", "ts"], kind="stable", ignore_index=True)
+    parts = []
+    for _, grp in df.groupby("twinId", sort=True):
+        x = grp["ts"].to_numpy().astype("datetime64[ns]").astype(np.int64).astype(float)
+        idx = lttb_indices(x, grp["risk"].to_numpy(), max_points)
+        parts.append(grp.iloc[idx])
+    return pd.concat(parts, ignore_index=True)
+
+
+def render_risk_png(sub: pd.DataFrame) -> bytes:
+    """Dark-themed multi-twin risk chart with threshold overlays, as PNG bytes."""
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(11, 4.5), facecolor='#1e293b')
+    ax = fig.subplots()
+    ax.set_facecolor('#0f172a')
+
+    for idx, (twin, g) in enumerate(sub.groupby("twinId", sort=True)):
+        color = PALETTE[idx % len(PALETTE)]
+        ax.plot(g["ts"], g["risk"], label=str(twin), linewidth=2.5, alpha=0.9, color=color)
+
+    ax.set_ylim(0.0, 1.0)
+    ax.set_ylabel("Risk Score", fontsize=11, color='#f1f5f9', fontweight='bold')
+    ax.set_xlabel("Time", fontsize=11, color='#f1f5f9', fontweight='bold')
+    ax.tick_params(colors='#cbd5e1')
+
+    # Threshold overlays
+    ax.axhline(MEDIUM_RISK, color="#f59e0b", linestyle="--", linewidth=2, alpha=0.6, label='Medium Threshold')
+    ax.axhline(HIGH_RISK, color="#ef4444", linestyle="--", linewidth=2, alpha=0.6, label='High Threshold')
+
+    ax.grid(True, axis="both", linestyle="--", alpha=0.2, color='#475569')
+    ax.legend(loc="upper left", facecolor='#1e293b', edgecolor='#334155', fontsize=9, labelcolor='#f1f5f9', ncol=3)
+    for side in ("bottom", "top", "left", "right"):
+        ax.spines[side].set_color('#475569')
+
+    fig.tight_layout()
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", facecolor=fig.get_facecolor())
+    return buf.getvalue()
+
+
+def risk_chart_altair(sub: pd.DataFrame):
+    """Interactive (zoom/pan/tooltip) Vega-Lite version of the risk chart."""
+    import altair as alt  # ships with streamlit
+
+    lines = alt.Chart(sub).mark_line(strokeWidth=2).encode(
+        x=alt.X("ts:T", title="Time"),
+        y=alt.Y("risk:Q", title="Risk Score", scale=alt.Scale(domain=[0, 1])),
+        color=alt.Color("twinId:N", title="Twin", scale=alt.Scale(range=PALETTE)),
+        tooltip=["twinId", "ts:T", alt.Tooltip("risk:Q", format=".3f")],
+    )
+    thresholds = alt.Chart(pd.DataFrame({"y": [MEDIUM_RISK, HIGH_RISK], "c": ["#f59e0b", "#ef4444"]})).mark_rule(
+        strokeDash=[6, 4], opacity=0.6
+    ).encode(y="y:Q", color=alt.Color("c:N", scale=None))
+    return (lines + thresholds).properties(height=320).interactive()
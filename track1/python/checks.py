@@ -0,0 +1,142 @@
+"""Behavior checks on synthetic telemetry.
+
+Pins the equivalences the faster code paths rely on, using
+``synthetic.generate_docs`` (and ``mongomock`` where a database is needed):
+
+* ``to_df`` and ``columns_to_df`` decode the same documents to the same frame.
+* ``risk.score_collection`` matches the original per-twin scoring loop.
+* ``features.RollingFeatures`` fed in chunks matches a full recompute.
+* Merged shards match an unsharded ``run_pipeline`` with the same limit.
+
+    python checks.py             # run every check, exit 1 on the first failure
+    python checks.py decoders    # run the named check(s) only
+"""
+import argparse
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import shard
+from features import RollingFeatures, add_features
+from pipeline import run_pipeline, to_df
+from risk import MIN_TWIN_ROWS, score_collection
+from synthetic import generate_docs, mongomock_client, seed_database
+from telemetry import columns_to_df, docs_to_columns, schema_of
+
+
+def check_decoders() -> None:
+    """``to_df`` and ``columns_to_df`` give the same frame, including the ``ts`` dtype."""
+    for coll in ("turbine1", "compressor1", "retail1"):
+        docs = generate_docs(coll, twins=3, points=50)
+        # Naive BSON datetimes (as pymongo returns them) and ISO "Z" strings decode alike
+        dated = [{**d, "ts": pd.Timestamp(d["ts"]).tz_localize(None).to_pydatetime()} for d in docs]
+        for variant in (docs, dated):
+            expected = to_df(variant)
+            actual = columns_to_df(docs_to_columns(variant, schema_of(variant), len(variant)))
+            pd.testing.assert_frame_equal(actual, expected)
+        assert str(expected["ts"].dtype) == "datetime64[ns]", expected["ts"].dtype
+
+
+def _reference_scores(df: pd.DataFrame) -> Tuple[List[Tuple[Any, float]], List[Tuple[Any, Any, float]]]:
+    # The per-twin loop the dashboard used before risk.py: ([(twin, risk)], [(twin, ts, risk)])
+    summary, series = [], []
+    for twin in df["twinId"].dropna().unique():
+        subset = df[df["twinId"] == twin]
+        if len(subset) < MIN_TWIN_ROWS:
+            continue
+        X_all = subset.select_dtypes(include=[np.number]).drop(columns=["twinId", "ts"], errors="ignore")
+        z = (X_all - X_all.mean()) / (X_all.std(ddof=0).replace(0, 1))
+        row_risk = (np.abs(z) > 3).mean(axis=1).fillna(0.0)
+        series += [(twin, t, float(np.clip(r, 0.0, 1.0))) for t, r in zip(subset["ts"], row_risk) if not pd.isna(t)]
+        summary.append((twin, float(np.clip(row_risk.mean(), 0.0, 1.0))))
+    return summary, series
+
+
+def check_risk() -> None:
+    """The vectorized scorer gives the per-twin loop's risks, twin order and series."""
+    for coll in ("turbine1", "transformer1", "compressor1"):
+        df = to_df(generate_docs(coll, twins=4, points=120, seed=1))
+        # Gaps, a constant metric, rows without ts or twinId, and a twin below MIN_TWIN_ROWS
+        metric = df.columns[0]
+        df.loc[df.index[::17], metric] = np.nan
+        df.loc[df["twinId"] == f"{coll}-2", metric] = 1.0
+        df.loc[df.index[5::41], "ts"] = pd.NaT
+        df.loc[df.index[7::97], "twinId"] = None
+        df = df[(df["twinId"] != f"{coll}-4") | (df.index % 10 == 0)]
+
+        expected, expected_series = _reference_scores(df)
+        summary, series = score_collection(df, coll)
+        assert list(summary["twinId"]) == [t for t, _ in expected], (list(summary["twinId"]), expected)
+        np.testing.assert_allclose(summary["risk"].to_numpy(), [r for _, r in expected], rtol=0, atol=1e-12)
+        key = lambda row: (row[0], row[1])
+        actual_series = sorted(zip(series["twinId"], series["ts"], series["risk"]), key=key)
+        expected_series = sorted(expected_series, key=key)
+        assert [key(r) for r in actual_series] == [key(r) for r in expected_series], coll
+        np.testing.assert_allclose([r[2] for r in actual_series], [r[2] for r in expected_series], rtol=0, atol=1e-12)
+
+
+def check_features() -> None:
+    """Rolling features computed incrementally, in chunks, equal a full recompute."""
+    df = to_df(generate_docs("turbine1", twins=3, points=200, seed=2))
+    df.loc[df.index[3::13], "vibration"] = np.nan
+    full = add_features(df)
+    rolling = RollingFeatures()
+    cuts = df["ts"].quantile([0.3, 0.65]).tolist()
+    chunks = [df[df["ts"] <= cuts[0]], df[df["ts"] <= cuts[1]], df]
+    parts = [rolling.update("turbine1", chunk) for chunk in chunks]
+    incremental = pd.concat(parts).loc[full.index]
+    assert len(incremental) == len(full), (len(incremental), len(full))
+    names = [c for c in full.columns if c not in df.columns]
+    np.testing.assert_allclose(incremental[names].to_numpy(), full[names].to_numpy(), rtol=1e-9, atol=1e-9)
+
+
+def check_shards() -> None:
+    """Merged shard scores equal an unsharded run over the same newest-N window."""
+    colls = ["turbine1", "retail1", "compressor1"]
+    twins, points = 7, 60
+    client = mongomock_client()
+    seed_database(client, "pmChecks", twins=twins, points=points, collections=colls)
+    key = ["collection", "twinId"]
+    # Whole collections, and a window whose oldest ts is not shared with older rows
+    for limit in (twins * points, twins * 40):
+        base = run_pipeline(client, "pmChecks", colls, limit=limit)["results"]
+        for shards in (1, 3):
+            parts = [shard.score_shard(client, "pmChecks", colls, k, shards, limit=limit) for k in range(shards)]
+            assert sum(p["twins"] for p in parts) == len(base), (limit, shards)
+            merged = shard.merge_shards(parts)["results"]
+            pd.testing.assert_frame_equal(
+                merged.sort_values(key, ignore_index=True), base.sort_values(key, ignore_index=True), obj=f"limit={limit} shards={shards}"
+            )
+
+
+CHECKS: Dict[str, Callable[[], None]] = {
+    "decoders": check_decoders,
+    "risk": check_risk,
+    "features": check_features,
+    "shards": check_shards,
+}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Check that the optimized code paths match their reference behavior.")
+    parser.add_argument("checks", nargs="*", metavar="CHECK", help=f"any of: {', '.join(CHECKS)} (default: all)")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.checks if name not in CHECKS]
+    if unknown:
+        parser.error(f"unknown check(s): {', '.join(unknown)}")
+
+    for name in args.checks or list(CHECKS):
+        start = time.perf_counter()
+        try:
+            CHECKS[name]()
+        except AssertionError as e:
+            print(f"FAIL {name}: {e}")
+            return 1
+        print(f"ok   {name} ({(time.perf_counter() - start) * 1000:.0f} ms)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
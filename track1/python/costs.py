@@ -0,0 +1,110 @@
+"""Vectorized cost estimation and what-if scenarios.
+
+Costs are pure arithmetic on the per-twin risk, so they are evaluated for the
+whole fleet at once with NumPy broadcasting, and for a grid of horizons and
+revenue/maintenance multipliers in one pass. Nothing here touches telemetry:
+what-if analysis reuses an existing risk summary without re-fetching or
+re-scoring.
+"""
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_COSTS = {
+    "compressor1": {"revenue_per_hour": 41500.0, "maintenance_base": 207500.0},  # $500 = ₹41,500, $2500 = ₹207,500
+    "drillrig1": {"revenue_per_hour": 99600.0, "maintenance_base": 664000.0},    # $1200 = ₹99,600, $8000 = ₹664,000
+    "turbine1": {"revenue_per_hour": 124500.0, "maintenance_base": 830000.0},    # $1500 = ₹124,500, $10000 = ₹830,000
+    "pipeline1": {"revenue_per_hour": 58100.0, "maintenance_base": 332000.0},    # $700 = ₹58,100, $4000 = ₹332,000
+    "refinery1": {"revenue_per_hour": 166000.0, "maintenance_base": 1245000.0},  # $2000 = ₹166,000, $15000 = ₹1,245,000
+    "retail1": {"revenue_per_hour": 24900.0, "maintenance_base": 124500.0},      # $300 = ₹24,900, $1500 = ₹124,500
+    "transformer1": {"revenue_per_hour": 49800.0, "maintenance_base": 415000.0}, # $600 = ₹49,800, $5000 = ₹415,000
+    "wellhead1": {"revenue_per_hour": 37350.0, "maintenance_base": 249000.0},    # $450 = ₹37,350, $3000 = ₹249,000
+}
+# Used for collections without a configured cost
+FALLBACK_COSTS = {"revenue_per_hour": 500.0, "maintenance_base": 2500.0}
+# Expected downtime hours = horizon * risk * DOWNTIME_FACTOR
+DOWNTIME_FACTOR = 0.25
+
+COST_COLUMNS = ["expected_downtime_hours", "revenue_loss", "maintenance_cost"]
+
+
+def cost_params(collections: Iterable[str], costs: Optional[Dict[str, Dict[str, float]]] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-row (revenue_per_hour, maintenance_base) arrays for ``collections``."""
+    costs = DEFAULT_COSTS if costs is None else costs
+    colls = pd.Series(list(collections), dtype=object)
+    rph = colls.map({c: float(v["revenue_per_hour"]) for c, v in costs.items()})
+    mbase = colls.map({c: float(v["maintenance_base"]) for c, v in costs.items()})
+    return (
+        rph.fillna(FALLBACK_COSTS["revenue_per_hour"]).to_numpy(dtype=float),
+        mbase.fillna(FALLBACK_COSTS["maintenance_base"]).to_numpy(dtype=float),
+    )
+
+
+def expected_costs(risk, horizon_hours, revenue_per_hour, maintenance_base) -> Dict[str, np.ndarray]:
+    """Downtime, revenue loss and maintenance cost; arguments broadcast against each other."""
+    risk = np.asarray(risk, dtype=float)
+    downtime = np.asarray(horizon_hours, dtype=float) * risk * DOWNTIME_FACTOR
+    return {
+        "expected_downtime_hours": downtime,
+        "revenue_loss": downtime * revenue_per_hour,
+        "maintenance_cost": np.asarray(maintenance_base, dtype=float) * (0.5 + 1.5 * risk),
+    }
+
+
+def cost_frame(
+    risk_summary: pd.DataFrame, horizon_hours: float, costs: Optional[Dict[str, Dict[str, float]]] = None
+) -> pd.DataFrame:
+    """Cost columns (rounded to 2 decimals) for each row of a ``risk.score_frames`` summary."""
+    rph, mbase = cost_params(risk_summary["collection"], costs)
+    out = expected_costs(risk_summary["risk"].to_numpy(dtype=float), horizon_hours, rph, mbase)
+    return pd.DataFrame({k: np.round(v, 2) for k, v in out.items()}, index=risk_summary.index)
+
+
+def what_if(
+    risk_summary: pd.DataFrame,
+    horizons: Sequence[float],
+    revenue_scales: Sequence[float] = (1.0,),
+    maintenance_scales: Sequence[float] = (1.0,),
+    costs: Optional[Dict[str, Dict[str, float]]] = None,
+    by_collection: bool = False,
+) -> pd.DataFrame:
+    """Fleet cost totals for every (horizon, revenue scale, maintenance scale) scenario.
+
+    Scales multiply the configured revenue per hour and maintenance base.
+    Returns one row per scenario (per collection too if ``by_collection``)
+    with the summed cost columns and ``total_cost`` (revenue loss plus
+    maintenance).
+    """
+    h = np.asarray(horizons, dtype=float)
+    rs = np.asarray(revenue_scales, dtype=float)
+    ms = np.asarray(maintenance_scales, dtype=float)
+    grid = pd.MultiIndex.from_product([h, rs, ms], names=["horizonHours", "revenueScale", "maintenanceScale"])
+    if risk_summary.empty:
+        return pd.DataFrame(columns=[*grid.names, *COST_COLUMNS, "total_cost"])
+
+    risk = risk_summary["risk"].to_numpy(dtype=float)
+    rph, mbase = cost_params(risk_summary["collection"], costs)
+    # Axes: horizon x revenue scale x maintenance scale x twin
+    out = expected_costs(
+        risk,
+        h[:, None, None, None],
+        rph * rs[None, :, None, None],
+        mbase * ms[None, None, :, None],
+    )
+    shape = (len(h), len(rs), len(ms), len(risk))
+    if by_collection:
+        codes, names = pd.factorize(risk_summary["collection"])
+        onehot = np.zeros((len(risk), len(names)))
+        onehot[np.arange(len(risk)), codes] = 1.0
+        sums = {k: (np.broadcast_to(v, shape) @ onehot).reshape(-1, len(names)) for k, v in out.items()}
+        frame = pd.DataFrame(
+            {k: v.ravel() for k, v in sums.items()},
+            index=pd.MultiIndex.from_tuples(
+                [(*g, c) for g in grid for c in names], names=[*grid.names, "collection"]
+            ),
+        )
+    else:
+        frame = pd.DataFrame({k: np.broadcast_to(v, shape).sum(axis=-1).ravel() for k, v in out.items()}, index=grid)
+    frame["total_cost"] = frame["revenue_loss"] + frame["maintenance_cost"]
+    return frame.round(2).reset_index()
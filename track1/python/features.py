@@ -0,0 +1,204 @@
+"""Rolling-window and multi-resolution features per twin.
+
+For every metric and twin, computes over the last ``w`` readings (for each
+``w`` in ``WINDOWS``) the mean, standard deviation and least-squares slope,
+plus exponentially weighted means for each span in ``EWM_SPANS``:
+
+    {metric}_mean_{w}, {metric}_std_{w}, {metric}_slope_{w}, {metric}_ewm_{span}
+
+Windows count readings, not wall time. Rolling statistics are computed with
+``sliding_window_view``: a strided (n, metrics, w) view over the twin's
+readings, with no copies, reduced along the last axis (the slope is a single
+matmul with the centred positions). The first readings of a twin are
+edge-padded with its first value, so every row has features and none are NaN.
+
+``RollingFeatures`` keeps the last ``max(WINDOWS) - 1`` readings and the EWMA
+state per twin. New rows are then computed against that tail without
+re-reading the full window, and give exactly the values a full recompute
+would.
+"""
+import re
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Rolling window lengths, in readings (roughly short / medium / long trend)
+WINDOWS = (5, 20, 60)
+EWM_SPANS = (10, 50)
+
+_FEATURE_RE = re.compile(r"_(?:mean|std|slope|ewm)_\d+$")
+
+
+def is_feature_column(name: Any) -> bool:
+    """True for columns produced by this module (as opposed to raw metrics)."""
+    return isinstance(name, str) and _FEATURE_RE.search(name) is not None
+
+
+def metric_columns(df: pd.DataFrame) -> List[str]:
+    """Raw numeric metric columns of a ``to_df`` frame (no ids, timestamps or derived features)."""
+    numeric = df.select_dtypes(include=[np.number]).columns
+    return [c for c in numeric if c not in ("twinId", "ts") and not is_feature_column(c)]
+
+
+def feature_names(metrics: Sequence[str], windows: Sequence[int] = WINDOWS, spans: Sequence[int] = EWM_SPANS) -> List[str]:
+    names = []
+    for m in metrics:
+        for w in windows:
+            names += [f"{m}_mean_{w}", f"{m}_std_{w}", f"{m}_slope_{w}"]
+        names += [f"{m}_ewm_{s}" for s in spans]
+    return names
+
+
+def rolling_stats(padded: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(mean, std, slope) over each trailing ``window`` of ``padded`` (rows oldest first).
+
+    ``padded`` has ``window - 1`` history rows before the n rows to compute;
+    each result is (n, metrics). The slope is per reading.
+    """
+    view = sliding_window_view(padded, window, axis=0)  # (n, metrics, window), no copy
+    mean = view.mean(axis=-1)
+    if window == 1:
+        return mean, np.zeros_like(mean), np.zeros_like(mean)
+    std = view.std(axis=-1)
+    pos = np.arange(window) - (window - 1) / 2.0
+    slope = view @ (pos / (pos @ pos))
+    return mean, std, slope
+
+
+def _ffill(values: np.ndarray) -> np.ndarray:
+    # Forward-fill NaNs down each column
+    idx = np.where(np.isnan(values), 0, np.arange(len(values))[:, None])
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    return values[idx, np.arange(values.shape[1])]
+
+
+def ewm(values: np.ndarray, span: int, prev: np.ndarray) -> np.ndarray:
+    """EWMA (``adjust=False``) of ``values`` continuing from the previous EWMA ``prev``."""
+    alpha = 2.0 / (span + 1.0)
+    seeded = np.vstack([prev[None, :], values])
+    return pd.DataFrame(seeded).ewm(alpha=alpha, adjust=False).mean().to_numpy()[1:]
+
+
+class RollingFeatures:
+    """Incremental rolling/EWMA features per (collection, twinId).
+
+    ``update`` consumes rows newer than the last ``ts`` seen for the
+    collection and returns their features; state is the last
+    ``max(windows) - 1`` readings and the current EWMA per twin.
+    """
+
+    def __init__(self, windows: Sequence[int] = WINDOWS, spans: Sequence[int] = EWM_SPANS):
+        if not windows or min(windows) < 1:
+            raise ValueError("windows must be positive")
+        self.windows = tuple(sorted(windows))
+        self.spans = tuple(spans)
+        self.history = max(self.windows) - 1
+        # collection -> metric columns the state was built for
+        self.metrics: Dict[str, List[str]] = {}
+        # (collection, twinId) -> (tail readings, EWMA per span)
+        self.state: Dict[Tuple[str, Any], Tuple[np.ndarray, np.ndarray]] = {}
+        # (collection, twinId) -> newest feature row
+        self.latest_rows: Dict[Tuple[str, Any], np.ndarray] = {}
+        self.last_ts: Dict[str, pd.Timestamp] = {}
+        self.lock = threading.Lock()
+
+    def reset(self, coll: Optional[str] = None) -> None:
+        with self.lock:
+            if coll is None:
+                self.metrics.clear()
+                self.state.clear()
+                self.latest_rows.clear()
+                self.last_ts.clear()
+                return
+            self.metrics.pop(coll, None)
+            self.last_ts.pop(coll, None)
+            for key in [k for k in self.state if k[0] == coll]:
+                self.state.pop(key, None)
+                self.latest_rows.pop(key, None)
+
+    def _twin(self, coll: str, twin: Any, values: np.ndarray) -> np.ndarray:
+        tail, ewm_prev = self.state.get((coll, twin), (None, None))
+        if tail is None:
+            # Leading gaps take the first reading of the metric
+            first = _ffill(values[::-1])[-1:]
+            tail = np.repeat(first, self.history, axis=0)
+            ewm_prev = np.repeat(first, len(self.spans), axis=0)
+        else:
+            first = tail[-1:] if self.history else ewm_prev[:1]
+        # Gaps repeat the previous reading of the same metric
+        values = _ffill(np.vstack([first, values]))[1:]
+        padded = np.vstack([tail, values])
+        n, m = values.shape
+        out = np.empty((n, m, 3 * len(self.windows) + len(self.spans)))
+        for i, w in enumerate(self.windows):
+            mean, std, slope = rolling_stats(padded[self.history - (w - 1):], w)
+            out[:, :, 3 * i], out[:, :, 3 * i + 1], out[:, :, 3 * i + 2] = mean, std, slope
+        ewm_now = np.empty_like(ewm_prev)
+        for j, span in enumerate(self.spans):
+            series = ewm(values, span, ewm_prev[j])
+            out[:, :, 3 * len(self.windows) + j] = series
+            ewm_now[j] = series[-1]
+        self.state[(coll, twin)] = (padded[-self.history:] if self.history else padded[:0], ewm_now)
+        flat = out.reshape(n, -1)
+        self.latest_rows[(coll, twin)] = flat[-1]
+        return flat
+
+    def update(self, coll: str, df: pd.DataFrame) -> pd.DataFrame:
+        """Features for the rows of ``df`` newer than the last seen ``ts``.
+
+        Returns those rows (all columns of ``df``, original order and index)
+        with the feature columns appended. A change of metric columns resets
+        the collection's state.
+        """
+        if df.empty:
+            return df
+        with self.lock:
+            new = df
+            if "ts" in df.columns:
+                last = self.last_ts.get(coll)
+                new = df[df["ts"].notna() if last is None else df["ts"] > last]
+            if new.empty:
+                return new
+            metrics = metric_columns(new)
+            if self.metrics.get(coll) != metrics:
+                for key in [k for k in self.state if k[0] == coll]:
+                    self.state.pop(key, None)
+                    self.latest_rows.pop(key, None)
+                self.metrics[coll] = metrics
+            ordered = new.sort_values("ts", kind="stable") if "ts" in new.columns else new.iloc[::-1]
+            values = ordered[metrics].to_numpy(dtype=float)
+            twins = ordered["twinId"] if "twinId" in ordered.columns else pd.Series(None, index=ordered.index)
+            codes, uniques = pd.factorize(twins, use_na_sentinel=False)
+            feats = np.empty((len(ordered), len(metrics) * (3 * len(self.windows) + len(self.spans))))
+            for code, twin in enumerate(uniques):
+                rows = np.flatnonzero(codes == code)
+                feats[rows] = self._twin(coll, twin, values[rows])
+            if "ts" in ordered.columns:
+                self.last_ts[coll] = ordered["ts"].iloc[-1]
+            # Column order: per metric, per window (mean, std, slope), then EWMAs
+            names = feature_names(metrics, self.windows, self.spans)
+            frame = pd.DataFrame(feats, index=ordered.index, columns=names).loc[new.index]
+        return pd.concat([new, frame], axis=1)
+
+    def latest(self, coll: Optional[str] = None) -> pd.DataFrame:
+        """Newest feature row per (collection, twinId)."""
+        with self.lock:
+            rows = []
+            for (c, twin), row in self.latest_rows.items():
+                if coll is not None and c != coll:
+                    continue
+                names = feature_names(self.metrics[c], self.windows, self.spans)
+                rows.append({"collection": c, "twinId": twin, **dict(zip(names, row))})
+        return pd.DataFrame(rows)
+
+
+def add_features(df: pd.DataFrame, windows: Sequence[int] = WINDOWS, spans: Sequence[int] = EWM_SPANS) -> pd.DataFrame:
+    """``df`` (``to_df`` output) with rolling features for every row, computed in one pass."""
+    if df.empty:
+        return df
+    out = RollingFeatures(windows, spans).update("", df)
+    # Rows without a ts are not part of any trend; they keep NaN features
+    return df.join(out[[c for c in out.columns if c not in df.columns]])
@@ -0,0 +1,245 @@
+"""Index advisor for the dashboard's and backend's query shapes.
+
+Every hot read in this project sorts on ``ts`` (or ``timestamp``/``runId``)
+and takes the newest N documents. Without a supporting index MongoDB runs a
+COLLSCAN followed by a blocking in-memory SORT, which gets slower as the
+collection grows and fails once the sort exceeds its 100 MB memory limit.
+
+``advise`` runs ``explain`` for each query shape and reports the plan stages,
+whether a blocking SORT or COLLSCAN is involved, and (with
+``executionStats`` verbosity) timings and documents examined. ``ensure_indexes``
+creates the recommended index wherever no equivalent one exists.
+
+    python indexes.py                      # report only (exit 1 if any are missing)
+    python indexes.py --create             # also create missing indexes
+    python indexes.py --verbosity queryPlanner --collections turbine1
+"""
+import argparse
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+from pymongo import MongoClient
+from pymongo.errors import OperationFailure
+
+from pipeline import COLLECTIONS, DB_NAME, MONGO_URI, RESULTS_COLLECTION, RUNS_COLLECTION, SERIES_COLLECTION
+
+logger = logging.getLogger("pm.indexes")
+
+# Collection written by the Node backend's Alert model
+ALERTS_COLLECTION = "alerts"
+
+IndexKey = List[Tuple[str, int]]
+
+
+def telemetry_shapes(sample_twin: Any = None) -> List[Dict[str, Any]]:
+    """Query shapes issued against every telemetry collection."""
+    return [
+        # load_docs / load_columns / backend /api/twin, and the ts-delta syncs
+        {"name": "latest", "filter": {}, "sort": [("ts", -1)], "limit": 1000, "index": [("ts", -1)]},
+        # per-twin windows (aggregate.py partitions by twinId, ordered by ts)
+        {
+            "name": "twin_latest",
+            "filter": {"twinId": sample_twin},
+            "sort": [("ts", -1)],
+            "limit": 1000,
+            "index": [("twinId", 1), ("ts", -1)],
+        },
+    ]
+
+
+def support_shapes() -> Dict[str, List[Dict[str, Any]]]:
+    """Query shapes on the alert and precomputed-results collections."""
+    return {
+        ALERTS_COLLECTION: [
+            # Alert.countDocuments persistence check: equality fields first, range last
+            {
+                "name": "recent_alerts",
+                "filter": {"twinId": "", "field": "", "resolved": False, "timestamp": {"$gte": datetime.now(timezone.utc)}},
+                "sort": None,
+                "limit": 0,
+                "index": [("twinId", 1), ("field", 1), ("resolved", 1), ("timestamp", -1)],
+            },
+            # GET /api/alerts
+            {
+                "name": "open_alerts",
+                "filter": {"resolved": False},
+                "sort": [("timestamp", -1)],
+                "limit": 100,
+                "index": [("resolved", 1), ("timestamp", -1)],
+            },
+        ],
+        RUNS_COLLECTION: [
+            {"name": "latest_run", "filter": {"complete": True}, "sort": [("runId", -1)], "limit": 1, "index": [("complete", 1), ("runId", -1)]},
+        ],
+        RESULTS_COLLECTION: [
+            {"name": "run_results", "filter": {"runId": ""}, "sort": None, "limit": 0, "index": [("runId", 1), ("collection", 1)]},
+        ],
+        SERIES_COLLECTION: [
+            {"name": "run_series", "filter": {"runId": ""}, "sort": None, "limit": 0, "index": [("runId", 1), ("collection", 1)]},
+        ],
+    }
+
+
+def _walk(node: Any) -> Iterator[Dict[str, Any]]:
+    # Every plan node, across classic, SBE ("queryPlan") and sharded ("shards") explain layouts
+    if isinstance(node, dict):
+        if "stage" in node:
+            yield node
+        for value in node.values():
+            yield from _walk(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _walk(value)
+
+
+def plan_stages(explain: Dict[str, Any]) -> List[str]:
+    """Stage names of the winning plan, root first."""
+    winning = explain.get("queryPlanner", {}).get("winningPlan", {})
+    return [node["stage"] for node in _walk(winning)]
+
+
+def has_index(existing: Dict[str, Dict[str, Any]], key: IndexKey) -> bool:
+    """True if an index starts with ``key`` (or its exact reverse, which serves the same sorts)."""
+    reverse = [(f, -d) for f, d in key]
+    for info in existing.values():
+        prefix = [(f, int(d)) for f, d in info["key"][: len(key)] if isinstance(d, (int, float))]
+        if prefix in (key, reverse):
+            return True
+    return False
+
+
+def explain_shape(client: MongoClient, db_name: str, coll: str, shape: Dict[str, Any], verbosity: str) -> Dict[str, Any]:
+    """Run ``explain`` for one query shape and summarize its plan."""
+    cmd: Dict[str, Any] = {"find": coll, "filter": shape["filter"]}
+    if shape["sort"]:
+        cmd["sort"] = dict(shape["sort"])
+    if shape["limit"]:
+        cmd["limit"] = shape["limit"]
+    explain = client[db_name].command("explain", cmd, verbosity=verbosity)
+    stages = plan_stages(explain)
+    execution = explain.get("executionStats", {})
+    return {
+        "stages": " > ".join(stages),
+        "collscan": "COLLSCAN" in stages,
+        "blockingSort": "SORT" in stages,
+        "ms": execution.get("executionTimeMillis"),
+        "docsExamined": execution.get("totalDocsExamined"),
+        "keysExamined": execution.get("totalKeysExamined"),
+        "returned": execution.get("nReturned"),
+    }
+
+
+def advise(
+    client: MongoClient,
+    db_name: str,
+    colls: Optional[List[str]] = None,
+    verbosity: str = "executionStats",
+    include_support: bool = True,
+) -> pd.DataFrame:
+    """One row per (collection, query shape): recommended index, whether it exists, and the current plan.
+
+    ``verbosity="queryPlanner"`` only plans the queries (cheap enough for a
+    startup check); ``executionStats`` also runs them for timings.
+    """
+    db = client[db_name]
+    targets: Dict[str, List[Dict[str, Any]]] = {}
+    for coll in COLLECTIONS if colls is None else colls:
+        sample = db[coll].find_one({"twinId": {"$ne": None}}, {"twinId": 1})
+        targets[coll] = telemetry_shapes(sample["twinId"] if sample else None)
+    if include_support:
+        targets.update(support_shapes())
+
+    existing_colls = set(db.list_collection_names())
+    rows = []
+    for coll, shapes in targets.items():
+        if coll not in existing_colls:
+            continue
+        existing = db[coll].index_information()
+        for shape in shapes:
+            row = {
+                "collection": coll,
+                "query": shape["name"],
+                "index": ", ".join(f"{f}:{d}" for f, d in shape["index"]),
+                "present": has_index(existing, shape["index"]),
+            }
+            try:
+                row.update(explain_shape(client, db_name, coll, shape, verbosity))
+            except (OperationFailure, NotImplementedError) as e:
+                row["error"] = str(e)
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def ensure_indexes(
+    client: MongoClient, db_name: str, colls: Optional[List[str]] = None, include_support: bool = True
+) -> List[str]:
+    """Create every recommended index that has no equivalent yet; returns the names created."""
+    db = client[db_name]
+    targets: Dict[str, List[Dict[str, Any]]] = {coll: telemetry_shapes() for coll in (COLLECTIONS if colls is None else colls)}
+    if include_support:
+        targets.update(support_shapes())
+
+    existing_colls = set(db.list_collection_names())
+    created = []
+    for coll, shapes in targets.items():
+        if coll not in existing_colls:
+            continue
+        existing = db[coll].index_information()
+        for shape in shapes:
+            if has_index(existing, shape["index"]):
+                continue
+            name = db[coll].create_index(shape["index"])
+            existing = db[coll].index_information()
+            logger.info("created index %s on %s", name, coll)
+            created.append(f"{coll}.{name}")
+    return created
+
+
+def check_indexes(client: MongoClient, db_name: str, colls: Optional[List[str]] = None, create: bool = False) -> pd.DataFrame:
+    """Startup check: optionally create missing indexes, then plan (not run) each query shape.
+
+    Logs a warning for every shape still planned as a COLLSCAN or blocking SORT.
+    """
+    if create:
+        ensure_indexes(client, db_name, colls)
+    report = advise(client, db_name, colls, verbosity="queryPlanner")
+    if report.empty:
+        return report
+    flagged = ~report["present"]
+    for col in ("collscan", "blockingSort"):
+        if col in report.columns:
+            flagged |= report[col].fillna(False).astype(bool)
+    for row in report[flagged].itertuples():
+        logger.warning("%s/%s has no supporting index {%s} (plan: %s)", row.collection, row.query, row.index, getattr(row, "stages", "?"))
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Explain the app's query shapes and create missing indexes.")
+    parser.add_argument("--mongo-uri", default=MONGO_URI)
+    parser.add_argument("--db", default=DB_NAME)
+    parser.add_argument("--collections", nargs="+", default=COLLECTIONS, metavar="COLL")
+    parser.add_argument("--verbosity", choices=["queryPlanner", "executionStats"], default="executionStats")
+    parser.add_argument("--no-support", action="store_true", help="skip the alerts and results collections")
+    parser.add_argument("--create", action="store_true", help="create missing indexes, then report again")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    client = MongoClient(args.mongo_uri)
+    include_support = not args.no_support
+    report = advise(client, args.db, args.collections, args.verbosity, include_support)
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(report.to_string(index=False) if not report.empty else "no collections found")
+        if args.create:
+            created = ensure_indexes(client, args.db, args.collections, include_support)
+            print(f"\nCreated {len(created)} index(es): {', '.join(created) or '-'}\n")
+            if created:
+                print(advise(client, args.db, args.collections, args.verbosity, include_support).to_string(index=False))
+    missing = report[~report["present"]] if not report.empty else report
+    return 1 if len(missing) and not args.create else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
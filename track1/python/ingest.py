@@ -0,0 +1,278 @@
+"""Background change-stream ingestion with incremental online scoring.
+
+``IngestWorker`` subscribes to a MongoDB change stream over the twin
+collections and feeds each micro-batch of inserted documents to an
+``OnlineScorer``. Updated running risk and the newly scored points are
+published to a ``LiveRiskStore``, which the dashboard renders from memory.
+Change streams need a replica set or sharded cluster; on a standalone server
+the worker falls back to tailing each collection by ``ts``.
+
+    python ingest.py --collections turbine1 compressor1   # log live risk changes
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pymongo import MongoClient
+from pymongo.errors import OperationFailure, PyMongoError
+
+from online import OnlineScorer
+from telemetry import columns_to_df, discover_fields, docs_to_columns, load_columns, load_frame, schema_of
+
+logger = logging.getLogger("pm.ingest")
+
+# Max seconds a change waits in the micro-batch before it is scored
+FLUSH_SECONDS = 0.2
+# Seconds between ts-tail queries on standalone servers
+TAIL_INTERVAL = 0.5
+# Rows per collection used to warm up the running statistics at start
+PRIME_ROWS = 1000
+# Max documents read per collection per tail query
+TAIL_BATCH_ROWS = 10_000
+# "auto" (change streams, else ts tailing), "change_stream" or "tail"
+INGEST_MODE = os.getenv("INGEST_MODE", "auto")
+
+
+class LiveRiskStore:
+    """Thread-safe latest online risk per twin plus a bounded recent risk series per collection."""
+
+    def __init__(self, max_points: int = 5000):
+        self.max_points = max_points
+        self.version = 0
+        self._risk: Dict[Tuple[str, Any], Dict[str, Any]] = {}
+        self._series: Dict[str, Deque[Tuple[Any, Any, float]]] = {}
+        self._lag: Deque[float] = deque(maxlen=500)
+        self._cond = threading.Condition()
+
+    def publish(self, coll: str, scored: pd.DataFrame, risk: Dict[Any, Tuple[float, int]], received_at: float) -> None:
+        """Record newly ``scored`` points and the running ``risk`` {twinId: (risk, points)} of ``coll``."""
+        now = time.time()
+        with self._cond:
+            series = self._series.setdefault(coll, deque(maxlen=self.max_points))
+            series.extend(zip(scored["twinId"], scored["ts"], scored["risk"]))
+            last_ts = scored.groupby("twinId", sort=False, observed=True)["ts"].max()
+            for twin, (value, points) in risk.items():
+                self._risk[(coll, twin)] = {
+                    "collection": coll,
+                    "twinId": twin,
+                    "onlineRisk": value,
+                    "points": points,
+                    "lastTs": last_ts.get(twin),
+                    "updatedAt": now,
+                }
+            self._lag.append(now - received_at)
+            self.version += 1
+            self._cond.notify_all()
+
+    def wait(self, version: int, timeout: Optional[float] = None) -> int:
+        """Block until the store is newer than ``version`` (or ``timeout``); returns the current version."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.version > version, timeout)
+            return self.version
+
+    def risk_frame(self, colls: Optional[List[str]] = None) -> pd.DataFrame:
+        with self._cond:
+            rows = [r for (c, _), r in self._risk.items() if colls is None or c in colls]
+        cols = ["collection", "twinId", "onlineRisk", "points", "lastTs", "updatedAt"]
+        return pd.DataFrame(rows, columns=cols).sort_values("onlineRisk", ascending=False, ignore_index=True)
+
+    def series(self, coll: str) -> pd.DataFrame:
+        with self._cond:
+            points = list(self._series.get(coll, ()))
+        return pd.DataFrame(points, columns=["twinId", "ts", "risk"])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            lag = list(self._lag)
+            return {
+                "version": self.version,
+                "twins": len(self._risk),
+                "p50LagMs": round(float(np.median(lag)) * 1000, 1) if lag else None,
+                "maxLagMs": round(max(lag) * 1000, 1) if lag else None,
+            }
+
+
+def _cursor_value(val: Any) -> Any:
+    # Raw ts as stored (ISO string or datetime) for $gt queries
+    if isinstance(val, np.datetime64):
+        return pd.Timestamp(val).to_pydatetime()
+    return val
+
+
+class IngestWorker(threading.Thread):
+    """Daemon thread: change stream (or ts tailing) -> ``OnlineScorer`` -> ``LiveRiskStore``."""
+
+    def __init__(
+        self,
+        client: MongoClient,
+        db_name: str,
+        colls: List[str],
+        scorer: OnlineScorer,
+        store: LiveRiskStore,
+        mode: str = INGEST_MODE,
+        prime_rows: int = PRIME_ROWS,
+    ):
+        if mode not in ("auto", "change_stream", "tail"):
+            raise ValueError(f"unknown ingest mode {mode!r}")
+        super().__init__(name="pm-ingest", daemon=True)
+        self.client = client
+        self.db_name = db_name
+        self.colls = list(colls)
+        self.scorer = scorer
+        self.store = store
+        self.requested_mode = mode
+        self.mode = "starting"
+        self.prime_rows = prime_rows
+        self.events = 0
+        self.last_error: Optional[str] = None
+        self.resume_token: Optional[Dict[str, Any]] = None
+        self._stop_event = threading.Event()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop_event.set()
+        self.join(timeout)
+
+    def status(self) -> Dict[str, Any]:
+        return {"mode": self.mode, "events": self.events, "lastError": self.last_error, **self.store.stats()}
+
+    def _prime(self) -> None:
+        # Warm the running statistics so the first live points are scored against a baseline
+        for coll in self.colls:
+            if coll in self.scorer.last_ts or self.prime_rows <= 0:
+                continue
+            df = load_frame(self.client, self.db_name, coll, limit=self.prime_rows)
+            self._score(coll, df, time.time())
+
+    def _score(self, coll: str, df: pd.DataFrame, received_at: float) -> None:
+        if df.empty:
+            return
+        scored = self.scorer.update_frame(coll, df)
+        if scored.empty:
+            return
+        risk = {t: (self.scorer.risk(coll, t), self.scorer.points(coll, t)) for t in pd.unique(scored["twinId"])}
+        self.store.publish(coll, scored, risk, received_at)
+        self.events += len(scored)
+
+    def run(self) -> None:
+        backoff = 1.0
+        while not self._stop_event.is_set():
+            try:
+                if self.requested_mode != "tail":
+                    try:
+                        self._run_change_stream()
+                        continue
+                    except (OperationFailure, NotImplementedError) as e:
+                        # Standalone servers reject $changeStream (code 40573)
+                        if self.requested_mode == "change_stream":
+                            raise
+                        logger.info("change streams unavailable (%s); tailing by ts", e)
+                        self.requested_mode = "tail"
+                self._run_tail()
+            except Exception as e:  # keep the worker alive across transient failures
+                self.last_error = str(e)
+                logger.warning("ingest error, retrying in %.0fs: %s", backoff, e, exc_info=not isinstance(e, PyMongoError))
+                self._stop_event.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+    def _run_change_stream(self) -> None:
+        pipeline = [{"$match": {"operationType": "insert", "ns.coll": {"$in": self.colls}}}]
+        with self.client[self.db_name].watch(
+            pipeline, max_await_time_ms=int(FLUSH_SECONDS * 1000), resume_after=self.resume_token
+        ) as stream:
+            self.mode = "change_stream"
+            self._prime()
+            # Inserted documents are decoded with the same projection and dtypes as the primed frames
+            schemas = {coll: discover_fields(self.client, self.db_name, coll) for coll in self.colls}
+            pending: Dict[str, List[Dict[str, Any]]] = {}
+            first_at = 0.0
+            token = self.resume_token
+            while not self._stop_event.is_set() and stream.alive:
+                change = stream.try_next()
+                if change is not None:
+                    if not pending:
+                        first_at = time.time()
+                    pending.setdefault(change["ns"]["coll"], []).append(change["fullDocument"])
+                    token = stream.resume_token
+                if pending and (change is None or time.time() - first_at >= FLUSH_SECONDS):
+                    for coll, docs in pending.items():
+                        if not schemas.get(coll):
+                            schemas[coll] = schema_of(docs)
+                        self._score(coll, columns_to_df(docs_to_columns(docs, schemas[coll], len(docs))), first_at)
+                    # Advance only once the batch is scored, so a failed batch is re-read on resume
+                    self.resume_token = token
+                    pending = {}
+
+    def _run_tail(self) -> None:
+        self.mode = "tail"
+        self._prime()
+        cursors: Dict[str, Any] = {}
+        schemas: Dict[str, Dict[str, str]] = {}
+        for coll in self.colls:
+            newest = self.client[self.db_name][coll].find_one({"ts": {"$ne": None}}, {"ts": 1}, sort=[("ts", -1)])
+            cursors[coll] = newest["ts"] if newest else None
+            schemas[coll] = discover_fields(self.client, self.db_name, coll)
+        while not self._stop_event.is_set():
+            for coll in self.colls:
+                if not schemas[coll]:
+                    schemas[coll] = discover_fields(self.client, self.db_name, coll)
+                    if not schemas[coll]:
+                        continue
+                query = {"ts": {"$gt": cursors[coll]}} if cursors[coll] is not None else {"ts": {"$ne": None}}
+                cols = load_columns(
+                    self.client, self.db_name, coll, limit=TAIL_BATCH_ROWS, schema=schemas[coll], query=query, oldest_first=True
+                )
+                n = len(cols.get("ts", ()))
+                if not n:
+                    continue
+                received_at = time.time()
+                if n == TAIL_BATCH_ROWS:
+                    # Leave rows sharing the last ts for the next query so $gt does not skip any
+                    ts = cols["ts"]
+                    k = n
+                    while k > 0 and ts[k - 1] == ts[n - 1]:
+                        k -= 1
+                    if k > 0:
+                        cols = {f: arr[:k] for f, arr in cols.items()}
+                cursors[coll] = _cursor_value(cols["ts"][-1])
+                self._score(coll, columns_to_df(cols), received_at)
+            self._stop_event.wait(TAIL_INTERVAL)
+
+
+def main(argv=None) -> int:
+    from pipeline import COLLECTIONS, DB_NAME, MONGO_URI
+
+    parser = argparse.ArgumentParser(description="Stream new telemetry into running per-twin risk scores.")
+    parser.add_argument("--mongo-uri", default=MONGO_URI)
+    parser.add_argument("--db", default=DB_NAME)
+    parser.add_argument("--collections", nargs="+", default=COLLECTIONS, metavar="COLL")
+    parser.add_argument("--mode", choices=["auto", "change_stream", "tail"], default=INGEST_MODE)
+    parser.add_argument("--decay", type=float, default=0.0, help="online scoring decay per point")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    store = LiveRiskStore()
+    worker = IngestWorker(
+        MongoClient(args.mongo_uri), args.db, args.collections, OnlineScorer(decay=args.decay), store, mode=args.mode
+    )
+    worker.start()
+    version = 0
+    try:
+        while worker.is_alive():
+            version = store.wait(version, timeout=5.0)
+            status = worker.status()
+            top = store.risk_frame().head(5)
+            summary = ", ".join(f"{r.twinId}={r.onlineRisk:.3f}" for r in top.itertuples())
+            logger.info("%s v%d events=%d lag_p50=%sms top: %s", status["mode"], version, status["events"], status["p50LagMs"], summary)
+    except KeyboardInterrupt:
+        worker.stop(timeout=5.0)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
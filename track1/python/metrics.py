@@ -0,0 +1,176 @@
+"""Stage-level instrumentation for dashboard reruns.
+
+``RunMetrics`` records, per stage and collection, wall time, RSS delta, the
+documents/bytes read from MongoDB and the in-memory rows a stage processed
+for one rerun. ``MetricsRegistry`` accumulates runs
+for export in Prometheus text format, served by ``start_metrics_server`` or
+written as a logfmt log line per rerun.
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+logger = logging.getLogger("pm.metrics")
+
+try:
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):  # non-POSIX
+    _PAGE_SIZE = 4096
+
+
+def rss_bytes() -> Optional[int]:
+    """Current resident set size, or None where it cannot be read cheaply."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        pass
+    try:
+        import resource
+
+        # Peak rather than current RSS on non-Linux systems (KB on Linux/BSD, bytes on macOS)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except ImportError:
+        return None
+
+
+class RunMetrics:
+    """Measurements for one rerun; thread-safe so fetch workers can report into it."""
+
+    def __init__(self):
+        self.records: List[Dict[str, Any]] = []
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float, collection: Optional[str] = None, **extra: Any) -> Dict[str, Any]:
+        rec = {"stage": stage, "collection": collection, "seconds": seconds, "docs": None, "bytes": None, "rows": None, "rss_delta_mb": None}
+        rec.update(extra)
+        with self._lock:
+            self.records.append(rec)
+        return rec
+
+    def begin(self, stage: str, collection: Optional[str] = None) -> Tuple[str, Optional[str], float, Optional[int]]:
+        """Start timing ``stage``; pass the token to ``end``. Use ``stage()`` where a block fits."""
+        return stage, collection, time.perf_counter(), rss_bytes()
+
+    def end(self, token: Tuple[str, Optional[str], float, Optional[int]], **extra: Any) -> Dict[str, Any]:
+        stage, collection, start, rss0 = token
+        seconds = time.perf_counter() - start
+        rss1 = rss_bytes()
+        delta = (rss1 - rss0) / 2**20 if rss0 is not None and rss1 is not None else None
+        return self.add(stage, seconds, collection, rss_delta_mb=delta, **extra)
+
+    @contextmanager
+    def stage(self, stage: str, collection: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Time a block; the yielded dict accepts extra fields such as ``docs``, ``bytes`` and ``rows``.
+
+        ``docs``/``bytes`` count what was read from MongoDB; stages that only work
+        on frames already in memory report ``rows`` so the fetch counters stay honest.
+        """
+        extra: Dict[str, Any] = {}
+        token = self.begin(stage, collection)
+        try:
+            yield extra
+        finally:
+            self.end(token, **extra)
+
+    def frame(self) -> pd.DataFrame:
+        with self._lock:
+            return pd.DataFrame(self.records, columns=["stage", "collection", "seconds", "docs", "bytes", "rows", "rss_delta_mb"])
+
+    def totals(self) -> Dict[str, float]:
+        """Seconds per stage summed over collections."""
+        out: Dict[str, float] = {}
+        with self._lock:
+            for rec in self.records:
+                out[rec["stage"]] = out.get(rec["stage"], 0.0) + rec["seconds"]
+        return out
+
+    def log_line(self) -> str:
+        """logfmt summary of the run, e.g. ``stage_fetch_s=0.120 docs=8000 bytes=512000``."""
+        parts = [f"stage_{name}_s={secs:.3f}" for name, secs in self.totals().items()]
+        with self._lock:
+            docs = sum(r["docs"] or 0 for r in self.records)
+            nbytes = sum(r["bytes"] or 0 for r in self.records)
+        parts += [f"docs={docs}", f"bytes={nbytes}"]
+        return " ".join(parts)
+
+
+class MetricsRegistry:
+    """Cumulative per-(stage, collection) counters across runs."""
+
+    def __init__(self, prefix: str = "pm_dashboard"):
+        self.prefix = prefix
+        self.runs = 0
+        self._series: Dict[Tuple[str, str], Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, run: RunMetrics) -> None:
+        with run._lock:
+            records = list(run.records)
+        with self._lock:
+            self.runs += 1
+            for rec in records:
+                key = (rec["stage"], rec["collection"] or "")
+                s = self._series.setdefault(key, {"seconds": 0.0, "count": 0, "docs": 0, "bytes": 0, "last": 0.0})
+                s["seconds"] += rec["seconds"]
+                s["count"] += 1
+                s["docs"] += rec["docs"] or 0
+                s["bytes"] += rec["bytes"] or 0
+                s["last"] = rec["seconds"]
+
+    def render(self) -> str:
+        """Prometheus text exposition format."""
+        p = self.prefix
+        lines = [
+            f"# HELP {p}_runs_total Dashboard reruns observed.",
+            f"# TYPE {p}_runs_total counter",
+        ]
+        with self._lock:
+            lines.append(f"{p}_runs_total {self.runs}")
+            series = sorted(self._series.items())
+        metrics = [
+            ("stage_seconds_total", "counter", "Cumulative wall time per stage.", "seconds"),
+            ("stage_runs_total", "counter", "Times each stage ran.", "count"),
+            ("stage_last_seconds", "gauge", "Wall time of the latest run of each stage.", "last"),
+            ("docs_fetched_total", "counter", "Documents fetched from MongoDB.", "docs"),
+            ("bytes_fetched_total", "counter", "BSON bytes fetched from MongoDB (columnar path).", "bytes"),
+        ]
+        for name, kind, help_text, field in metrics:
+            lines.append(f"# HELP {p}_{name} {help_text}")
+            lines.append(f"# TYPE {p}_{name} {kind}")
+            for (stage, coll), s in series:
+                lines.append(f'{p}_{name}{{stage="{stage}",collection="{coll}"}} {s[field]}')
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+def start_metrics_server(port: int, registry: MetricsRegistry = REGISTRY) -> ThreadingHTTPServer:
+    """Serve ``registry.render()`` at ``/metrics`` on a daemon thread."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
@@ -0,0 +1,181 @@
+"""Streaming z-score anomaly scoring with Welford running statistics.
+
+Keeps a running mean/variance per (collection, twinId, metric) and scores each
+new telemetry point against the statistics seen so far, in O(1) per point,
+instead of recomputing mean/std over the whole fetched window. With ``decay``
+> 0 older points are down-weighted exponentially (weighted Welford update), so
+the baseline follows slow drift. State can be saved to and loaded from JSON
+so scoring continues across reruns and processes.
+"""
+import json
+import logging
+import math
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from risk import MIN_TWIN_ROWS, Z_THRESHOLD
+from telemetry import parse_ts
+
+logger = logging.getLogger("pm.online")
+
+Key = Tuple[str, Any, str]
+
+
+class OnlineScorer:
+    """Per-(collection, twinId, metric) Welford statistics and per-twin running risk.
+
+    A point is scored only once its metric has seen ``warmup`` earlier points;
+    before that it counts as in-band. ``risk(coll, twin)`` is the running
+    (decayed) mean of the row risks, i.e. the streaming analogue of the
+    batch ``avg_ts_risk``.
+    """
+
+    def __init__(self, decay: float = 0.0, warmup: int = MIN_TWIN_ROWS, z_threshold: float = Z_THRESHOLD):
+        if not 0.0 <= decay < 1.0:
+            raise ValueError("decay must be in [0, 1)")
+        self.decay = decay
+        self.warmup = warmup
+        self.z_threshold = z_threshold
+        # key -> [count, weight, mean, m2]
+        self.stats: Dict[Key, List[float]] = {}
+        # (collection, twinId) -> [count, weight, mean risk]
+        self.twin_risk: Dict[Tuple[str, Any], List[float]] = {}
+        # collection -> newest ts consumed
+        self.last_ts: Dict[str, pd.Timestamp] = {}
+        self.lock = threading.Lock()
+
+    def _update(self, state: List[float], x: float) -> None:
+        keep = 1.0 - self.decay
+        state[0] += 1
+        state[1] = state[1] * keep + 1.0
+        delta = x - state[2]
+        state[2] += delta / state[1]
+        state[3] = state[3] * keep + delta * (x - state[2])
+
+    def score_point(self, coll: str, twin: Any, values: Dict[str, float]) -> float:
+        """Score one telemetry point, then fold it into the running statistics.
+
+        Returns the fraction of metrics whose |z| against the prior statistics
+        exceeds ``z_threshold``. Missing (NaN) metrics count as in-band.
+        """
+        if not values:
+            return 0.0
+        out_of_band = 0
+        for metric, x in values.items():
+            if x is None or math.isnan(x):
+                continue
+            state = self.stats.get((coll, twin, metric))
+            if state is None:
+                state = self.stats[(coll, twin, metric)] = [0, 0.0, 0.0, 0.0]
+            if state[0] >= self.warmup:
+                std = math.sqrt(state[3] / state[1]) if state[1] > 0 else 0.0
+                z = (x - state[2]) / (std if std > 0 else 1.0)
+                if abs(z) > self.z_threshold:
+                    out_of_band += 1
+            self._update(state, x)
+        row_risk = out_of_band / len(values)
+        twin_state = self.twin_risk.get((coll, twin))
+        if twin_state is None:
+            twin_state = self.twin_risk[(coll, twin)] = [0, 0.0, 0.0]
+        twin_state[0] += 1
+        twin_state[1] = twin_state[1] * (1.0 - self.decay) + 1.0
+        twin_state[2] += (row_risk - twin_state[2]) / twin_state[1]
+        return row_risk
+
+    def update_frame(self, coll: str, df: pd.DataFrame) -> pd.DataFrame:
+        """Consume the rows of ``df`` (``to_df`` output) newer than the last seen ``ts``.
+
+        Rows are processed oldest first. Returns the newly scored rows as a
+        frame with columns collection, twinId, ts, risk.
+        """
+        empty = pd.DataFrame(columns=["collection", "twinId", "ts", "risk"])
+        if df.empty or "ts" not in df.columns:
+            return empty
+        with self.lock:
+            new = df[df["ts"].notna()]
+            last = self.last_ts.get(coll)
+            if last is not None:
+                new = new[new["ts"] > last]
+            if new.empty:
+                return empty
+            new = new.sort_values("ts", kind="stable")
+            metrics = new.select_dtypes(include=[np.number]).drop(columns=["twinId", "ts"], errors="ignore")
+            names = list(metrics.columns)
+            values = metrics.to_numpy(dtype=float)
+            twins = new["twinId"].to_numpy() if "twinId" in new.columns else [None] * len(new)
+            risks = np.empty(len(new))
+            for i, (twin, row) in enumerate(zip(twins, values)):
+                if twin is not None and isinstance(twin, float) and math.isnan(twin):
+                    risks[i] = 0.0
+                    continue
+                risks[i] = self.score_point(coll, twin, dict(zip(names, row)))
+            self.last_ts[coll] = new["ts"].iloc[-1]
+            return pd.DataFrame({"collection": coll, "twinId": twins, "ts": new["ts"].to_numpy(), "risk": risks})
+
+    def risk(self, coll: str, twin: Any) -> Optional[float]:
+        state = self.twin_risk.get((coll, twin))
+        return None if state is None else float(min(max(state[2], 0.0), 1.0))
+
+    def points(self, coll: str, twin: Any) -> int:
+        """Points scored so far for ``twin``."""
+        state = self.twin_risk.get((coll, twin))
+        return 0 if state is None else int(state[0])
+
+    def risk_frame(self) -> pd.DataFrame:
+        """Current running risk per (collection, twinId)."""
+        with self.lock:
+            rows = [(c, t, float(min(max(s[2], 0.0), 1.0)), int(s[0])) for (c, t), s in self.twin_risk.items()]
+        return pd.DataFrame(rows, columns=["collection", "twinId", "onlineRisk", "points"])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "decay": self.decay,
+            "warmup": self.warmup,
+            "z_threshold": self.z_threshold,
+            "stats": [[c, t, m, *s] for (c, t, m), s in self.stats.items()],
+            "twin_risk": [[c, t, *s] for (c, t), s in self.twin_risk.items()],
+            "last_ts": {c: ts.isoformat() for c, ts in self.last_ts.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "OnlineScorer":
+        scorer = cls(decay=data["decay"], warmup=data["warmup"], z_threshold=data["z_threshold"])
+        scorer.stats = {(c, t, m): list(s) for c, t, m, *s in data["stats"]}
+        scorer.twin_risk = {(c, t): list(s) for c, t, *s in data["twin_risk"]}
+        scorer.last_ts = {c: parse_ts(ts) for c, ts in data["last_ts"].items()}
+        return scorer
+
+    def save(self, path: str) -> None:
+        """Write state to ``path`` atomically."""
+        with self.lock:
+            data = self.to_dict()
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> "OnlineScorer":
+        """Load state from ``path``, or start fresh with ``kwargs`` if it does not exist.
+
+        Statistics accumulated under a different ``decay``, ``warmup`` or
+        ``z_threshold`` than requested in ``kwargs`` are discarded (with a
+        warning) rather than continued under mismatched settings.
+        """
+        if not os.path.exists(path):
+            return cls(**kwargs)
+        with open(path) as f:
+            data = json.load(f)
+        changed = {k: (data[k], v) for k, v in kwargs.items() if k in data and data[k] != v}
+        if changed:
+            logger.warning(
+                "discarding online state in %s: %s",
+                path,
+                ", ".join(f"{k} {old} -> {new}" for k, (old, new) in changed.items()),
+            )
+            return cls(**kwargs)
+        return cls.from_dict(data)
@@ -0,0 +1,60 @@
+"""Server-side filtering, pagination and styling of the risk table.
+
+Only the rows of the current page are styled and sent to the browser, so the
+payload and render time depend on the page size, not on the fleet size.
+Styling is computed for the whole page at once (a CSS string per severity,
+broadcast across the columns) instead of calling a Python function per row.
+"""
+import math
+from typing import TYPE_CHECKING, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+if TYPE_CHECKING:  # importing Styler loads matplotlib
+    from pandas.io.formats.style import Styler
+
+SEVERITY_CSS = {
+    "high": "background-color: rgba(239, 68, 68, 0.2); color: #000000",    # light red
+    "medium": "background-color: rgba(245, 158, 11, 0.2); color: #000000",  # light orange
+    "low": "background-color: rgba(34, 197, 94, 0.2); color: #000000",     # light green
+}
+PAGE_SIZES = [25, 50, 100, 250]
+
+
+def filter_results(
+    res_df: pd.DataFrame,
+    severities: Optional[Iterable[str]] = None,
+    collections: Optional[Iterable[str]] = None,
+    risk_range: Tuple[float, float] = (0.0, 1.0),
+) -> pd.DataFrame:
+    """Rows of ``res_df`` matching every given filter (``None`` means no filter), order preserved."""
+    if res_df.empty:
+        return res_df
+    mask = res_df["risk"].between(*risk_range).to_numpy()
+    if severities is not None:
+        mask &= res_df["severity"].isin(list(severities)).to_numpy()
+    if collections is not None:
+        mask &= res_df["collection"].isin(list(collections)).to_numpy()
+    return res_df[mask]
+
+
+def page_count(rows: int, page_size: int) -> int:
+    return max(1, math.ceil(rows / page_size))
+
+
+def page_slice(df: pd.DataFrame, page: int, page_size: int) -> pd.DataFrame:
+    """Rows of 1-based ``page``; pages past the end are clamped to the last one."""
+    page = min(max(1, page), page_count(len(df), page_size))
+    start = (page - 1) * page_size
+    return df.iloc[start:start + page_size]
+
+
+def severity_styles(df: pd.DataFrame) -> pd.DataFrame:
+    """CSS for every cell of ``df``, by the row's severity, in one vectorized pass."""
+    css = df["severity"].map(SEVERITY_CSS).fillna(SEVERITY_CSS["low"]).to_numpy(dtype=object)
+    return pd.DataFrame(np.repeat(css[:, None], df.shape[1], axis=1), index=df.index, columns=df.columns)
+
+
+def style_page(df: pd.DataFrame) -> "Styler":
+    return df.style.apply(severity_styles, axis=None)
@@ -0,0 +1,310 @@
+"""Headless predictive-maintenance pipeline.
+
+Everything the dashboard computes (fetch, feature frames, z-score risk,
+severity, costs) without importing Streamlit or matplotlib, so it can run on a
+schedule from ``batch.py`` and write results the dashboard reads back.
+scikit-learn is imported only when a model is trained.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Tuple, Callable, Optional
+
+import numpy as np
+import pandas as pd
+from pymongo import MongoClient
+
+from compact import compact_frame
+from costs import DEFAULT_COSTS, cost_frame
+from features import is_feature_column
+from risk import score_frames
+from telemetry import load_frame, parse_ts
+
+# --- Config ---
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+DB_NAME = os.getenv("DB_NAME", "digitalTwinsTelemetryDB")
+FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", "16"))
+RESULTS_COLLECTION = os.getenv("RESULTS_COLLECTION", "pm_results")
+SERIES_COLLECTION = os.getenv("SERIES_COLLECTION", "pm_risk_series")
+# One marker per fully written run; readers only pick runs listed here
+RUNS_COLLECTION = os.getenv("RUNS_COLLECTION", "pm_runs")
+COLLECTIONS = [
+    "compressor1",
+    "drillrig1",
+    "pipeline1",
+    "refinery1",
+    "retail1",
+    "transformer1",
+    "turbine1",
+    "wellhead1",
+]
+
+
+def load_docs(client: MongoClient, db_name: str, coll: str, limit: int = 1000) -> List[Dict[str, Any]]:
+    db = client[db_name]
+    cursor = db[coll].find({}).sort("ts", -1).limit(limit)
+    return list(cursor)
+
+
+def load_collections(
+    client: MongoClient,
+    db_name: str,
+    colls: List[str],
+    limit: int = 1000,
+    fetch: Optional[Callable[..., pd.DataFrame]] = None,
+    max_workers: int = FETCH_WORKERS,
+) -> Dict[str, Tuple[pd.DataFrame, float]]:
+    """Fetch several collections in parallel on the shared client.
+
+    ``fetch(client, db_name, coll, limit=...)`` must return a DataFrame shaped
+    like ``to_df`` output; it defaults to ``to_df(load_docs(...))``. Returns
+    {collection: (df, seconds)} in the order of ``colls``. MongoClient is
+    thread-safe and pools connections, so one client serves all workers.
+    """
+    if fetch is None:
+        fetch = lambda c, d, coll, limit: to_df(load_docs(c, d, coll, limit=limit))
+
+    def timed(coll: str) -> Tuple[pd.DataFrame, float]:
+        start = time.perf_counter()
+        df = fetch(client, db_name, coll, limit=limit)
+        return df, time.perf_counter() - start
+
+    if not colls:
+        return {}
+    workers = max(1, min(max_workers, len(colls)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mongo-fetch") as pool:
+        futures = {coll: pool.submit(timed, coll) for coll in colls}
+        return {coll: fut.result() for coll, fut in futures.items()}
+
+
+def to_df(docs: List[Dict[str, Any]]) -> pd.DataFrame:
+    if not docs:
+        return pd.DataFrame()
+    df = pd.DataFrame(docs)
+    # Normalize timestamp column to pandas datetime (tz-naive UTC, as columns_to_df)
+    if "ts" in df.columns:
+        try:
+            df["ts"] = parse_ts(df["ts"])
+        except Exception:
+            pass
+    # Drop non-feature columns we won't train on
+    drop_cols = [c for c in ["_id", "status"] if c in df.columns]
+    df = df.drop(columns=drop_cols, errors="ignore")
+    # Keep numeric columns only (exclude sales); we will also carry ts separately
+    num_df = df.select_dtypes(include=[np.number]).copy()
+    for c in list(num_df.columns):
+        lc = str(c).lower()
+        if lc in ("sales", "lastsales"):
+            num_df.drop(columns=[c], inplace=True, errors="ignore")
+    # Add twinId if present (not as feature but to group/report)
+    if "twinId" in df.columns:
+        num_df["twinId"] = df["twinId"]
+    # Carry timestamp for time-series plots
+    if "ts" in df.columns:
+        num_df["ts"] = df["ts"]
+    return num_df
+
+
+def build_labels(features: pd.DataFrame) -> pd.Series:
+    # Unsup proxy: mark as 1 (at-risk) if any z-score > 3 or < -3 across metrics for that row
+    feat_only = features.select_dtypes(include=[np.number]).drop(columns=[c for c in ("twinId",) if c in features.columns], errors="ignore")
+    # Labels come from the raw metrics only; rolling features are model inputs
+    feat_only = feat_only[[c for c in feat_only.columns if not is_feature_column(c)]]
+    if feat_only.empty:
+        return pd.Series([0] * len(features), index=features.index)
+    z = (feat_only - feat_only.mean()) / (feat_only.std(ddof=0).replace(0, 1))
+    risky = (np.abs(z) > 3).any(axis=1).astype(int)
+    return risky
+
+
+def train_model(features: pd.DataFrame, labels: pd.Series, n_jobs: int = -1):
+    """Train a classifier and return (model, feature_names) used for training.
+
+    Ensures fallback training uses the same number of features as the
+    available numeric columns to avoid n_features mismatch at predict time.
+    ``n_jobs`` is passed to the forest; use 1 inside worker processes.
+    """
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.model_selection import train_test_split
+
+    X = features.select_dtypes(include=[np.number]).drop(columns=[c for c in ("twinId",) if c in features.columns], errors="ignore")
+    y = labels
+    feature_names = list(X.columns)
+    # If there are no numeric features, create a dummy single feature
+    if X.shape[1] == 0:
+        feature_names = ["f0"]
+    if X.empty or len(np.unique(y)) == 1:
+        # Fallback classifier with synthetic variability, matching feature width
+        n_features = max(1, len(feature_names))
+        model = RandomForestClassifier(n_estimators=50, random_state=42)
+        X_syn_np = np.random.randn(max(20, len(X) or 20), n_features)
+        # Fit using a DataFrame with explicit column names to avoid sklearn warnings
+        X_syn = pd.DataFrame(X_syn_np, columns=[f for f in feature_names])
+        y_syn = np.random.randint(0, 2, size=X_syn.shape[0])
+        model.fit(X_syn, y_syn)
+        return model, feature_names
+    
+    # Check if we have enough samples for stratified split
+    min_class_count = min(np.bincount(y))
+    if min_class_count < 2:
+        # Not enough samples for stratified split, use regular split
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.25, random_state=42)
+    else:
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.25, random_state=42, stratify=y)
+    model = RandomForestClassifier(n_estimators=200, max_depth=None, random_state=42, n_jobs=n_jobs)
+    model.fit(X_train, y_train)
+    return model, feature_names
+
+
+SEVERITY_ORDER = {"high": 2, "medium": 1, "low": 0}
+
+
+def build_results(
+    risk_summary: pd.DataFrame, horizon_hours: float, costs: Optional[Dict[str, Dict[str, float]]] = None
+) -> pd.DataFrame:
+    """Risk table (one row per twin, with costs) sorted by severity then risk.
+
+    ``costs`` maps collection to revenue_per_hour/maintenance_base (default ``DEFAULT_COSTS``).
+    """
+    if risk_summary.empty:
+        return pd.DataFrame()
+    res_df = pd.concat([
+        pd.DataFrame({
+            "collection": risk_summary["collection"],
+            "twinId": risk_summary["twinId"],
+            "risk": risk_summary["risk"].astype(float).round(3),
+            "severity": risk_summary["severity"],
+            "horizonHours": horizon_hours,
+        }),
+        cost_frame(risk_summary, horizon_hours, costs),
+    ], axis=1)
+    res_df["sev_order"] = res_df["severity"].map(SEVERITY_ORDER)
+    return (
+        res_df
+        .sort_values(["sev_order", "risk"], ascending=[False, False])
+        .drop(columns=["sev_order"])
+        .reset_index(drop=True)
+    )
+
+
+def summarize(
+    risk_summary: pd.DataFrame,
+    ts_df: pd.DataFrame,
+    horizon_hours: float,
+    costs: Optional[Dict[str, Dict[str, float]]] = None,
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Turn ``risk.score_frames`` output into (res_df, summary_df, ts_df).
+
+    ``res_df`` is the risk table with costs, ``summary_df`` the average risk
+    per twin and ``ts_df`` the per-row risk time series. Only ``res_df``
+    depends on ``horizon_hours`` and ``costs``, so what-if changes can call
+    this again on the same risk summary without re-scoring.
+    """
+    summary_df = pd.DataFrame({
+        "collection": risk_summary["collection"],
+        "twinId": risk_summary["twinId"],
+        "avgRisk": risk_summary["risk"].astype(float).round(3),
+    })
+    return build_results(risk_summary, horizon_hours, costs), summary_df, ts_df
+
+
+def score(
+    frames: Dict[str, pd.DataFrame], horizon_hours: float, compact: bool = False
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Score feature frames per collection; see ``summarize`` for the outputs.
+
+    ``compact`` returns ``ts_df`` in the ``compact.compact_series`` layout.
+    """
+    return summarize(*score_frames(frames, compact=compact), horizon_hours)
+
+
+def run_pipeline(
+    client: MongoClient,
+    db_name: str,
+    colls: Optional[List[str]] = None,
+    limit: int = 1000,
+    horizon_hours: float = 72,
+    columnar: bool = True,
+    compact: bool = False,
+    fetch: Optional[Callable[[MongoClient, str, str, int], pd.DataFrame]] = None,
+) -> Dict[str, Any]:
+    """Fetch and score ``colls`` (default: all ``COLLECTIONS``).
+
+    Returns {"results", "summary", "series", "frames", "timings"}; ``frames``
+    holds the non-empty feature frames and ``timings`` maps each collection to
+    its fetch seconds. ``compact`` keeps frames and series in the
+    ``compact`` module's float32/categorical layout. ``fetch`` replaces the
+    Mongo fetch (e.g. ``SnapshotStore.fetch``).
+    """
+    colls = list(colls or COLLECTIONS)
+    if fetch is None and columnar:
+        fetch = lambda c, d, coll, limit: load_frame(c, d, coll, limit=limit, compact=compact)
+    loaded = load_collections(client, db_name, colls, limit=limit, fetch=fetch)
+    frames = {coll: compact_frame(df) if compact else df for coll, (df, _) in loaded.items() if not df.empty}
+    res_df, summary_df, ts_df = score(frames, horizon_hours, compact=compact)
+    return {
+        "results": res_df,
+        "summary": summary_df,
+        "series": ts_df,
+        "frames": frames,
+        "timings": {coll: secs for coll, (_, secs) in loaded.items()},
+    }
+
+
+def write_results_mongo(client: MongoClient, db_name: str, output: Dict[str, Any], run_id: Optional[str] = None) -> str:
+    """Store a pipeline run in ``RESULTS_COLLECTION``/``SERIES_COLLECTION``.
+
+    Rows are tagged with ``runId``. A ``RUNS_COLLECTION`` marker is written
+    after both inserts and ``load_results`` only reads marked runs, so a
+    reader never picks a run that is still being written. Older runs are
+    removed after the marker.
+    """
+    run_id = run_id or datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S.%fZ")
+    db = client[db_name]
+    results = output["results"].merge(output["summary"], on=["collection", "twinId"], how="left")
+    series = output["series"]
+    if not results.empty:
+        db[RESULTS_COLLECTION].insert_many(results.assign(runId=run_id).to_dict("records"))
+    if not series.empty:
+        db[SERIES_COLLECTION].insert_many(series.assign(runId=run_id).to_dict("records"))
+    db[RUNS_COLLECTION].replace_one(
+        {"runId": run_id},
+        {"runId": run_id, "complete": True, "twins": len(results), "finishedAt": datetime.now(timezone.utc)},
+        upsert=True,
+    )
+    db[RUNS_COLLECTION].delete_many({"runId": {"$ne": run_id}})
+    db[RESULTS_COLLECTION].delete_many({"runId": {"$ne": run_id}})
+    db[SERIES_COLLECTION].delete_many({"runId": {"$ne": run_id}})
+    return run_id
+
+
+def write_results_parquet(output: Dict[str, Any], path: str) -> None:
+    """Write ``results.parquet`` (risk table + avgRisk) and ``series.parquet`` under ``path``."""
+    os.makedirs(path, exist_ok=True)
+    results = output["results"].merge(output["summary"], on=["collection", "twinId"], how="left")
+    results.to_parquet(os.path.join(path, "results.parquet"), index=False)
+    output["series"].to_parquet(os.path.join(path, "series.parquet"), index=False)
+
+
+def load_results(client: MongoClient, db_name: str, colls: Optional[List[str]] = None) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, Optional[str]]:
+    """Read the latest completed run written by ``write_results_mongo``.
+
+    Returns (res_df, summary_df, ts_df, run_id) shaped like ``score`` output.
+    """
+    db = client[db_name]
+    latest = db[RUNS_COLLECTION].find_one({"complete": True}, {"runId": 1}, sort=[("runId", -1)])
+    if latest is None:
+        return pd.DataFrame(), pd.DataFrame(columns=["collection", "twinId", "avgRisk"]), pd.DataFrame(columns=["collection", "twinId", "ts", "risk"]), None
+    query: Dict[str, Any] = {"runId": latest["runId"]}
+    if colls is not None:
+        query["collection"] = {"$in": list(colls)}
+    results = pd.DataFrame(list(db[RESULTS_COLLECTION].find(query, {"_id": 0, "runId": 0})))
+    series = pd.DataFrame(list(db[SERIES_COLLECTION].find(query, {"_id": 0, "runId": 0})), columns=["collection", "twinId", "ts", "risk"])
+    if results.empty:
+        return pd.DataFrame(), pd.DataFrame(columns=["collection", "twinId", "avgRisk"]), series, latest["runId"]
+    summary_df = results[["collection", "twinId", "avgRisk"]]
+    res_df = results.drop(columns=["avgRisk"])
+    res_df["sev_order"] = res_df["severity"].map(SEVERITY_ORDER)
+    res_df = res_df.sort_values(["sev_order", "risk"], ascending=[False, False]).drop(columns=["sev_order"]).reset_index(drop=True)
+    return res_df, summary_df, series, latest["runId"]
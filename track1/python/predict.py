@@ -0,0 +1,225 @@
+"""Batched, memoized failure-probability predictions from the model registry.
+
+``PredictionService`` runs one ``predict_proba`` call per collection over all
+of its twins' rows, using the current registry model. Inputs are gathered
+once into a float32 C-contiguous matrix in the model's ``feature_names``
+order, which is the layout the forest predicts on, so scikit-learn does not
+copy them again. Results are memoized per (collection, model version, data
+version). Telemetry is append-only, so by default the data version is the
+row count plus the oldest and newest ``ts``.
+
+``start_prediction_server`` exposes the service over local HTTP for the Node
+backend:
+
+    GET  /predict/<collection>?limit=1000    score the newest telemetry in Mongo
+    POST /predict/<collection>               score {"docs": [...]} sent by the caller
+    GET  /health
+
+    python predict.py --port 8502
+"""
+import argparse
+import json
+import logging
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+from pymongo import MongoClient
+
+from features import add_features, is_feature_column
+from pipeline import to_df
+from registry import MODEL_DIR, ModelRegistry
+from telemetry import load_frame
+
+logger = logging.getLogger("pm.predict")
+
+PREDICTION_COLUMNS = ["collection", "twinId", "failureProb", "latestProb", "rows", "modelVersion"]
+# Memoized (collection, model version, data version) results kept per service
+CACHE_ENTRIES = 256
+
+
+def data_version(frame: pd.DataFrame) -> Hashable:
+    """Cheap identity of an append-only telemetry window: rows and ts range, else a content hash."""
+    if "ts" in frame.columns and frame["ts"].notna().any():
+        ts = frame["ts"]
+        return (len(frame), str(ts.min()), str(ts.max()))
+    return int(pd.util.hash_pandas_object(frame, index=False).sum())
+
+
+def align(frame: pd.DataFrame, names: List[str]) -> pd.DataFrame:
+    """``frame`` as a float32 matrix in ``names`` order (missing columns NaN), wrapped without a further copy."""
+    X = np.empty((len(frame), len(names)), dtype=np.float32)
+    for j, name in enumerate(names):
+        if name in frame.columns:
+            X[:, j] = frame[name].to_numpy(dtype=np.float32, na_value=np.nan)
+        else:
+            X[:, j] = np.nan
+    # Named columns keep scikit-learn's feature-name check quiet; the block is the array above
+    return pd.DataFrame(X, columns=names, copy=False)
+
+
+class PredictionService:
+    """Per-collection ``predict_proba`` over registry models, memoized per model and data version."""
+
+    def __init__(self, registry: Optional[ModelRegistry] = None, cache_entries: int = CACHE_ENTRIES):
+        self.registry = registry or ModelRegistry(MODEL_DIR)
+        self.cache_entries = cache_entries
+        self.hits = 0
+        self.misses = 0
+        self._cache: "OrderedDict[Tuple[str, int, Hashable], pd.DataFrame]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def predict(self, coll: str, frame: pd.DataFrame, version: Optional[Hashable] = None) -> pd.DataFrame:
+        """Failure probability per twin of ``frame`` (``to_df`` output) for ``coll``.
+
+        ``failureProb`` is the mean positive-class probability over the
+        twin's rows in the window, ``latestProb`` that of its newest row.
+        Returns an empty frame when ``coll`` has no trained model.
+        """
+        loaded = self.registry.load(coll)
+        if loaded is None or frame.empty:
+            return pd.DataFrame(columns=PREDICTION_COLUMNS)
+        model, meta = loaded
+        key = (coll, meta["version"], data_version(frame) if version is None else version)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        names = meta["feature_names"]
+        if any(is_feature_column(n) for n in names):
+            frame = add_features(frame)
+        if "twinId" in frame.columns:
+            frame = frame[frame["twinId"].notna()]
+        if frame.empty:
+            return pd.DataFrame(columns=PREDICTION_COLUMNS)
+        classes = list(model.classes_)
+        if 1 in classes:
+            prob = model.predict_proba(align(frame, names))[:, classes.index(1)]
+        else:
+            prob = np.zeros(len(frame))
+
+        twins = frame["twinId"] if "twinId" in frame.columns else pd.Series(None, index=frame.index)
+        order = np.argsort(frame["ts"].to_numpy(), kind="stable") if "ts" in frame.columns else np.arange(len(frame))
+        per_row = pd.DataFrame({"twinId": twins.to_numpy()[order], "prob": prob[order]})
+        grouped = per_row.groupby("twinId", sort=False, observed=True, dropna=False)["prob"]
+        out = grouped.agg(failureProb="mean", latestProb="last", rows="size").reset_index()
+        out["twinId"] = out["twinId"].astype(object)
+        out.insert(0, "collection", coll)
+        out["modelVersion"] = meta["version"]
+        out = out[PREDICTION_COLUMNS].sort_values("failureProb", ascending=False, ignore_index=True)
+        with self._lock:
+            self._cache[key] = out
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+        return out
+
+    def predict_many(self, frames: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+        """``predict`` for every collection in ``frames``, concatenated."""
+        parts = [self.predict(coll, frame) for coll, frame in frames.items()]
+        parts = [p for p in parts if not p.empty]
+        return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=PREDICTION_COLUMNS)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._cache), "hits": self.hits, "misses": self.misses}
+
+
+def _records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    return json.loads(df.to_json(orient="records"))
+
+
+def start_prediction_server(
+    service: PredictionService, client: MongoClient, db_name: str, port: int, host: str = "127.0.0.1"
+) -> ThreadingHTTPServer:
+    """Serve ``service`` over HTTP on a daemon thread (see the module docstring for routes)."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, payload: Any) -> None:
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _collection(self) -> Optional[str]:
+            parts = urlparse(self.path).path.strip("/").split("/")
+            return parts[1] if len(parts) == 2 and parts[0] == "predict" and parts[1] else None
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path.rstrip("/") == "/health":
+                self._send(200, {"status": "ok", **service.stats()})
+                return
+            coll = self._collection()
+            if coll is None:
+                self._send(404, {"error": "not found"})
+                return
+            try:
+                limit = int(parse_qs(url.query).get("limit", ["1000"])[0])
+                frame = load_frame(client, db_name, coll, limit=limit)
+                self._send(200, {"collection": coll, "predictions": _records(service.predict(coll, frame))})
+            except ValueError as e:
+                self._send(400, {"error": str(e)})
+            except Exception as e:
+                logger.exception("prediction failed for %s", coll)
+                self._send(500, {"error": str(e)})
+
+        def do_POST(self):
+            coll = self._collection()
+            if coll is None:
+                self._send(404, {"error": "not found"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                docs = payload.get("docs")
+                if not isinstance(docs, list):
+                    raise ValueError('expected {"docs": [...]}')
+                self._send(200, {"collection": coll, "predictions": _records(service.predict(coll, to_df(docs)))})
+            except ValueError as e:
+                self._send(400, {"error": str(e)})
+            except Exception as e:
+                logger.exception("prediction failed for %s", coll)
+                self._send(500, {"error": str(e)})
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="predict-http", daemon=True).start()
+    return server
+
+
+def main(argv=None) -> int:
+    from pipeline import DB_NAME, MONGO_URI
+
+    parser = argparse.ArgumentParser(description="Serve batched failure-probability predictions over local HTTP.")
+    parser.add_argument("--mongo-uri", default=MONGO_URI)
+    parser.add_argument("--db", default=DB_NAME)
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    service = PredictionService(ModelRegistry(args.model_dir))
+    server = start_prediction_server(service, MongoClient(args.mongo_uri), args.db, args.port, args.host)
+    logger.info("serving predictions on http://%s:%d/predict/<collection>", args.host, args.port)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
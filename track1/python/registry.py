@@ -0,0 +1,148 @@
+"""On-disk registry of trained per-collection models.
+
+Each collection gets a directory under ``MODEL_DIR`` holding versioned
+``v<N>.joblib`` files and a ``meta.json`` describing the current version:
+feature names (the schema), a hash of the training window, per-feature
+mean/std and label rate. Models are loaded lazily with ``mmap_mode="r"`` so the
+forest arrays are paged in from disk rather than copied. ``get_or_train``
+refits only when there is no model, the schema changed, or the data drifted.
+"""
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from pipeline import build_labels, train_model
+
+MODEL_DIR = os.getenv("MODEL_DIR", "models")
+# Retrain when any feature mean moves by more than this many stored stds
+DRIFT_THRESHOLD = float(os.getenv("DRIFT_THRESHOLD", "0.5"))
+KEEP_VERSIONS = 3
+
+
+def feature_frame(features: pd.DataFrame) -> pd.DataFrame:
+    """Numeric model inputs of a ``to_df`` frame (what ``train_model`` fits on)."""
+    return features.select_dtypes(include=[np.number]).drop(columns=["twinId"], errors="ignore")
+
+
+def window_hash(X: pd.DataFrame) -> str:
+    """Stable content hash of a training window (values and column names)."""
+    h = hashlib.sha1("|".join(map(str, X.columns)).encode())
+    h.update(pd.util.hash_pandas_object(X, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def feature_stats(X: pd.DataFrame) -> Dict[str, List[float]]:
+    return {c: [float(X[c].mean()), float(X[c].std(ddof=0))] for c in X.columns}
+
+
+def drift_score(meta: Dict[str, Any], X: pd.DataFrame) -> float:
+    """Largest |mean shift| across features, in units of the stored std."""
+    worst = 0.0
+    for c, (mean, std) in meta.get("stats", {}).items():
+        if c not in X.columns or X[c].isna().all():
+            continue
+        shift = abs(float(X[c].mean()) - mean) / (std if std > 0 else 1.0)
+        worst = max(worst, shift)
+    return worst
+
+
+class ModelRegistry:
+    """Versioned, lazily loaded per-collection models."""
+
+    def __init__(self, root: str = MODEL_DIR, drift_threshold: float = DRIFT_THRESHOLD):
+        self.root = root
+        self.drift_threshold = drift_threshold
+        self._loaded: Dict[str, Tuple[int, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _dir(self, coll: str) -> str:
+        return os.path.join(self.root, coll)
+
+    def meta(self, coll: str) -> Optional[Dict[str, Any]]:
+        path = os.path.join(self._dir(coll), "meta.json")
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def load(self, coll: str) -> Optional[Tuple[Any, Dict[str, Any]]]:
+        """Return (model, meta) for the current version, loading it on first use."""
+        meta = self.meta(coll)
+        if meta is None:
+            return None
+        with self._lock:
+            cached = self._loaded.get(coll)
+            if cached is None or cached[0] != meta["version"]:
+                model = joblib.load(os.path.join(self._dir(coll), meta["file"]), mmap_mode="r")
+                cached = self._loaded[coll] = (meta["version"], model)
+        return cached[1], meta
+
+    def save(self, coll: str, model: Any, feature_names: List[str], X: pd.DataFrame, labels: pd.Series) -> Dict[str, Any]:
+        """Persist ``model`` as the next version of ``coll`` and return its metadata."""
+        os.makedirs(self._dir(coll), exist_ok=True)
+        prev = self.meta(coll)
+        version = (prev["version"] + 1) if prev else 1
+        fname = f"v{version}.joblib"
+        joblib.dump(model, os.path.join(self._dir(coll), fname))
+        meta = {
+            "collection": coll,
+            "version": version,
+            "file": fname,
+            "feature_names": feature_names,
+            "window_hash": window_hash(X),
+            "rows": int(len(X)),
+            "label_rate": float(labels.mean()) if len(labels) else 0.0,
+            "stats": feature_stats(X),
+            "trained_at": datetime.now(timezone.utc).isoformat(),
+        }
+        tmp = os.path.join(self._dir(coll), "meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp, os.path.join(self._dir(coll), "meta.json"))
+        for old in range(1, version - KEEP_VERSIONS + 1):
+            path = os.path.join(self._dir(coll), f"v{old}.joblib")
+            if os.path.exists(path):
+                os.remove(path)
+        return meta
+
+    def needs_training(self, coll: str, X: pd.DataFrame) -> Optional[str]:
+        """Reason to (re)train ``coll`` on window ``X``, or None if the stored model is current."""
+        meta = self.meta(coll)
+        if meta is None:
+            return "no model"
+        if meta["feature_names"] != list(X.columns):
+            return "schema changed"
+        if meta["window_hash"] == window_hash(X):
+            return None
+        drift = drift_score(meta, X)
+        if drift > self.drift_threshold:
+            return f"drift {drift:.2f}"
+        return None
+
+    def get_or_train(self, coll: str, features: pd.DataFrame, n_jobs: int = -1) -> Tuple[Any, Dict[str, Any], Optional[str]]:
+        """Return (model, meta, reason) for ``coll``, training only when needed.
+
+        ``reason`` is why a new model was fitted, or None if the stored one was
+        reused. Fallback models fitted on synthetic data (no numeric features
+        or a single label class) are returned but never persisted.
+        """
+        X = feature_frame(features)
+        reason = self.needs_training(coll, X)
+        if reason is None:
+            model, meta = self.load(coll)
+            return model, meta, None
+        labels = build_labels(features)
+        model, feature_names = train_model(features, labels, n_jobs=n_jobs)
+        if X.empty or labels.nunique() < 2:
+            return model, {"collection": coll, "version": 0, "feature_names": feature_names, "synthetic": True}, reason
+        meta = self.save(coll, model, feature_names, X, labels)
+        with self._lock:
+            self._loaded[coll] = (meta["version"], model)
+        return model, meta, reason
@@ -0,0 +1,119 @@
+"""Process-pool fan-out of per-collection fetch, scoring and training.
+
+Each worker process opens its own MongoClient once (clients must not cross a
+process boundary), then fetches, scores and optionally (re)trains one
+collection per task. Only compact frames travel back to the parent. Workers
+use single-threaded forests so N workers map onto N cores without
+oversubscription, and results are merged in input order so output is
+deterministic regardless of completion order.
+"""
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+from pymongo import MongoClient
+
+from compact import compact_frame, compact_series
+from features import add_features
+from pipeline import load_docs, summarize, to_df
+from registry import ModelRegistry
+from risk import concat_scores, score_collection
+from telemetry import load_frame
+
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(
+    mongo_uri: str, db_name: str, limit: int, columnar: bool, model_dir: Optional[str], compact: bool = False, features: bool = False
+) -> None:
+    _worker.update(
+        client=MongoClient(mongo_uri),
+        db_name=db_name,
+        limit=limit,
+        columnar=columnar,
+        model_dir=model_dir,
+        compact=compact,
+        features=features,
+    )
+    if model_dir is not None:
+        _worker["registry"] = ModelRegistry(model_dir)
+
+
+def _run_collection(coll: str) -> Dict[str, Any]:
+    client, db_name, limit = _worker["client"], _worker["db_name"], _worker["limit"]
+    start = time.perf_counter()
+    if _worker["columnar"]:
+        df = load_frame(client, db_name, coll, limit=limit, compact=_worker["compact"])
+    else:
+        df = to_df(load_docs(client, db_name, coll, limit=limit))
+        if _worker["compact"]:
+            df = compact_frame(df)
+    fetched = time.perf_counter()
+    summary, series = score_collection(df, coll)
+    if _worker["compact"]:
+        series = compact_series(series)  # smaller pickle back to the parent
+    out: Dict[str, Any] = {
+        "collection": coll,
+        "summary": summary,
+        "series": series,
+        "rows": len(df),
+        "fetch_seconds": fetched - start,
+        "score_seconds": time.perf_counter() - fetched,
+        "pid": os.getpid(),
+    }
+    registry = _worker.get("registry")
+    if registry is not None:
+        if df.empty:
+            out["model"] = {"version": None, "reason": "no data", "synthetic": False}
+        else:
+            _, meta, reason = registry.get_or_train(coll, add_features(df) if _worker["features"] else df, n_jobs=1)
+            out["model"] = {"version": meta["version"], "reason": reason, "synthetic": bool(meta.get("synthetic"))}
+    return out
+
+
+def run_parallel(
+    mongo_uri: str,
+    db_name: str,
+    colls: List[str],
+    limit: int = 1000,
+    horizon_hours: float = 72,
+    columnar: bool = True,
+    model_dir: Optional[str] = None,
+    max_workers: Optional[int] = None,
+    compact: bool = False,
+    features: bool = False,
+) -> Dict[str, Any]:
+    """Fetch, score (and train, if ``model_dir`` is given) ``colls`` across processes.
+
+    ``features`` trains on the raw metrics plus ``features.add_features`` columns.
+
+    Returns the same {"results", "summary", "series"} frames as
+    ``pipeline.run_pipeline`` plus "tasks", one row of timings (and model
+    status) per collection.
+    """
+    workers = max(1, min(max_workers or os.cpu_count() or 1, len(colls) or 1))
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=ctx,
+        initializer=_init_worker,
+        initargs=(mongo_uri, db_name, limit, columnar, model_dir, compact, features),
+    ) as pool:
+        # map() yields in input order, which keeps the merged output deterministic
+        parts = list(pool.map(_run_collection, colls))
+
+    risk_summary, ts_df = concat_scores([(p["summary"], p["series"]) for p in parts], compact=compact)
+    res_df, summary_df, ts_df = summarize(risk_summary, ts_df, horizon_hours)
+    tasks = pd.DataFrame([
+        {k: v for k, v in p.items() if k not in ("summary", "series", "model")} | {f"model_{k}": v for k, v in p.get("model", {}).items()}
+        for p in parts
+    ])
+    return {
+        "results": res_df,
+        "summary": summary_df,
+        "series": ts_df,
+        "tasks": tasks,
+    }
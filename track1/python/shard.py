@@ -0,0 +1,340 @@
+"""Sharded scoring for fleets too large for one worker.
+
+Every (collection, twinId) is hashed into one of N shards. A shard worker
+lists each collection's twins (a ``distinct`` on the ``twinId`` index), keeps
+its own, and fetches and scores only those. ``--limit`` is the same
+newest-N window per collection as in an unsharded run: the ``ts`` of the
+N-th newest document bounds every shard's query. Each twin's rows live in
+exactly one shard, so the per-twin risk matches an unsharded run. The one
+exception is readings that share the window's oldest ``ts``: shards keep all
+of them, while an unsharded fetch keeps an arbitrary subset that fills N.
+Merging is just concatenating the shard summaries and building the usual
+risk table with costs.
+
+Shards run either as local processes (``run_sharded``, ``batch.py
+--shards``) or on separate nodes. Local processes share one window bound per
+collection. Workers on separate nodes each look it up when they start, so
+documents inserted between their starts can shift it slightly. In the
+multi-node case each node runs one worker that writes its partial result to
+Mongo under a shared run id. A coordinator then waits for all N partials,
+merges them into the same ``pm_results``/``pm_risk_series`` run that
+``batch.py`` writes (shown by *Read precomputed results*), and deletes the
+partials:
+
+    python shard.py worker --run-id 20260101T0000 --shard 0 --shards 4   # on each node, shard 0..3
+    python shard.py merge --run-id 20260101T0000 --shards 4               # coordinator
+    python shard.py run --shards 4                                         # all shards on this box
+"""
+import argparse
+import multiprocessing
+import os
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+from pymongo import MongoClient
+
+from compact import compact_series
+from pipeline import COLLECTIONS, DB_NAME, MONGO_URI, summarize, write_results_mongo
+from risk import SERIES_COLUMNS, SUMMARY_COLUMNS, concat_scores, score_collection
+from telemetry import load_frame
+
+SHARD_RESULTS_COLLECTION = os.getenv("SHARD_RESULTS_COLLECTION", "pm_shard_results")
+SHARD_SERIES_COLLECTION = os.getenv("SHARD_SERIES_COLLECTION", "pm_shard_series")
+# Seconds between checks while the coordinator waits for shard partials
+MERGE_POLL_SECONDS = 2.0
+
+
+def shard_of(coll: str, twin: Any, shards: int) -> int:
+    """Stable shard of (collection, twinId); the same in every process and on every node."""
+    return zlib.crc32(f"{coll}\x1f{twin}".encode()) % shards
+
+
+def shard_twins(client: MongoClient, db_name: str, coll: str, shard: int, shards: int) -> List[Any]:
+    """Twin ids of ``coll`` that belong to ``shard``."""
+    twins = client[db_name][coll].distinct("twinId")
+    return [t for t in twins if t is not None and shard_of(coll, t, shards) == shard]
+
+
+def window_start(client: MongoClient, db_name: str, coll: str, limit: int) -> Any:
+    """Raw ``ts`` of the ``limit``-th newest document of ``coll``, or None if it has fewer (or no limit)."""
+    if not limit:
+        return None
+    cursor = client[db_name][coll].find({}, {"_id": 0, "ts": 1}).sort("ts", -1).skip(limit - 1).limit(1)
+    doc = next(iter(cursor), None)
+    return doc.get("ts") if doc else None
+
+
+def fetch_shard(
+    client: MongoClient,
+    db_name: str,
+    coll: str,
+    shard: int,
+    shards: int,
+    limit: int = 1000,
+    compact: bool = False,
+    start: Any = None,
+) -> pd.DataFrame:
+    """The twins of ``shard`` within the newest ``limit`` rows of the whole of ``coll``.
+
+    ``start`` is the window's oldest raw ``ts`` (``window_start``); it is
+    looked up when not given.
+    """
+    twins = shard_twins(client, db_name, coll, shard, shards)
+    if not twins:
+        return pd.DataFrame()
+    query: Dict[str, Any] = {"twinId": {"$in": twins}} if shards > 1 else {"twinId": {"$ne": None}}
+    if start is None:
+        start = window_start(client, db_name, coll, limit)
+    if start is not None:
+        query["ts"] = {"$gte": start}
+        # The bound already caps the window; readings tied at it may take a shard past ``limit``
+        limit = client[db_name][coll].count_documents(query)
+    return load_frame(client, db_name, coll, limit=limit, compact=compact, query=query)
+
+
+def score_shard(
+    client: MongoClient,
+    db_name: str,
+    colls: List[str],
+    shard: int,
+    shards: int,
+    limit: int = 1000,
+    compact: bool = False,
+    starts: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Fetch and score one shard of every collection in ``colls``.
+
+    ``starts`` maps collections to their ``window_start`` when the caller
+    has already looked it up for all shards. Returns {"shard", "summary",
+    "series", "rows", "twins", "fetch_seconds", "score_seconds"};
+    ``summary``/``series`` are ``risk.score_frames``-shaped.
+    """
+    if not 0 <= shard < shards:
+        raise ValueError(f"shard must be in [0, {shards}), got {shard}")
+    parts = []
+    rows = 0
+    fetch_seconds = score_seconds = 0.0
+    for coll in colls:
+        start = time.perf_counter()
+        start_ts = (starts or {}).get(coll)
+        df = fetch_shard(client, db_name, coll, shard, shards, limit=limit, compact=compact, start=start_ts)
+        fetched = time.perf_counter()
+        parts.append(score_collection(df, coll))
+        fetch_seconds += fetched - start
+        score_seconds += time.perf_counter() - fetched
+        rows += len(df)
+    summary, series = concat_scores(parts, compact=compact)
+    return {
+        "shard": shard,
+        "summary": summary,
+        "series": series,
+        "rows": rows,
+        "twins": len(summary),
+        "fetch_seconds": fetch_seconds,
+        "score_seconds": score_seconds,
+    }
+
+
+def merge_shards(
+    parts: List[Dict[str, Any]],
+    horizon_hours: float = 72,
+    costs: Optional[Dict[str, Dict[str, float]]] = None,
+    compact: bool = False,
+) -> Dict[str, Any]:
+    """Combine ``score_shard`` outputs into ``run_pipeline``-shaped results.
+
+    Returns {"results", "summary", "series", "shards", "totals"}. ``shards``
+    has one row of counts and timings per shard, and ``totals`` holds the fleet
+    severity counts and revenue at risk.
+    """
+    parts = sorted(parts, key=lambda p: p["shard"])
+    risk_summary, ts_df = concat_scores([(p["summary"], p["series"]) for p in parts], compact=compact)
+    res_df, summary_df, ts_df = summarize(risk_summary, ts_df, horizon_hours, costs)
+    severity = res_df["severity"].value_counts() if not res_df.empty else pd.Series(dtype=int)
+    totals = {
+        "twins": len(res_df),
+        **{level: int(severity.get(level, 0)) for level in ("high", "medium", "low")},
+        "revenueAtRisk": float(res_df["revenue_loss"].sum()) if not res_df.empty else 0.0,
+    }
+    return {
+        "results": res_df,
+        "summary": summary_df,
+        "series": ts_df,
+        "shards": pd.DataFrame([{k: v for k, v in p.items() if k not in ("summary", "series")} for p in parts]),
+        "totals": totals,
+    }
+
+
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(
+    mongo_uri: str, db_name: str, colls: List[str], shards: int, limit: int, compact: bool, starts: Dict[str, Any]
+) -> None:
+    _worker.update(
+        client=MongoClient(mongo_uri), db_name=db_name, colls=colls, shards=shards, limit=limit, compact=compact, starts=starts
+    )
+
+
+def _run_shard(shard: int) -> Dict[str, Any]:
+    w = _worker
+    out = score_shard(
+        w["client"], w["db_name"], w["colls"], shard, w["shards"], limit=w["limit"], compact=w["compact"], starts=w["starts"]
+    )
+    if w["compact"]:
+        out["series"] = compact_series(out["series"])  # smaller pickle back to the parent
+    out["pid"] = os.getpid()
+    return out
+
+
+def run_sharded(
+    mongo_uri: str,
+    db_name: str,
+    colls: List[str],
+    shards: int,
+    limit: int = 1000,
+    horizon_hours: float = 72,
+    max_workers: Optional[int] = None,
+    compact: bool = False,
+) -> Dict[str, Any]:
+    """Score all ``shards`` in local worker processes and merge them (see ``merge_shards``)."""
+    # One window bound per collection for every shard
+    client = MongoClient(mongo_uri)
+    starts = {coll: window_start(client, db_name, coll, limit) for coll in colls}
+    workers = max(1, min(max_workers or os.cpu_count() or 1, shards))
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(mongo_uri, db_name, list(colls), shards, limit, compact, starts),
+    ) as pool:
+        parts = list(pool.map(_run_shard, range(shards)))
+    return merge_shards(parts, horizon_hours, compact=compact)
+
+
+def save_partial(client: MongoClient, db_name: str, run_id: str, shards: int, part: Dict[str, Any]) -> None:
+    """Store one shard's output under ``run_id`` for a coordinator on another node."""
+    db = client[db_name]
+    shard = part["shard"]
+    # Re-running a shard replaces its earlier partial
+    db[SHARD_SERIES_COLLECTION].delete_many({"runId": run_id, "shard": shard})
+    if not part["series"].empty:
+        series = part["series"].astype({"collection": object, "twinId": object, "risk": float})
+        db[SHARD_SERIES_COLLECTION].insert_many(series.assign(runId=run_id, shard=shard).to_dict("records"))
+    summary = part["summary"].astype({"twinId": object, "risk": float})
+    db[SHARD_RESULTS_COLLECTION].replace_one(
+        {"runId": run_id, "shard": shard},
+        {
+            "runId": run_id,
+            "shard": shard,
+            "shards": shards,
+            "summary": summary.to_dict("records"),
+            "rows": part["rows"],
+            "twins": part["twins"],
+            "fetch_seconds": part["fetch_seconds"],
+            "score_seconds": part["score_seconds"],
+            "finishedAt": datetime.now(timezone.utc),
+        },
+        upsert=True,
+    )
+
+
+def load_partials(client: MongoClient, db_name: str, run_id: str, shards: int, timeout: float = 0.0) -> List[Dict[str, Any]]:
+    """Shard outputs saved under ``run_id``, waiting up to ``timeout`` seconds for all ``shards``.
+
+    Raises ``TimeoutError`` naming the missing shards.
+    """
+    db = client[db_name]
+    deadline = time.time() + timeout
+    while True:
+        docs = {d["shard"]: d for d in db[SHARD_RESULTS_COLLECTION].find({"runId": run_id, "shards": shards}, {"_id": 0})}
+        missing = sorted(set(range(shards)) - set(docs))
+        if not missing:
+            break
+        if time.time() >= deadline:
+            raise TimeoutError(f"run {run_id}: shard(s) {missing} of {shards} have not reported")
+        time.sleep(MERGE_POLL_SECONDS)
+    parts = []
+    for shard in range(shards):
+        doc = docs[shard]
+        series = pd.DataFrame(
+            list(db[SHARD_SERIES_COLLECTION].find({"runId": run_id, "shard": shard}, {"_id": 0, "runId": 0, "shard": 0})),
+            columns=SERIES_COLUMNS,
+        )
+        parts.append({
+            "shard": shard,
+            "summary": pd.DataFrame(doc["summary"], columns=SUMMARY_COLUMNS),
+            "series": series,
+            **{k: doc[k] for k in ("rows", "twins", "fetch_seconds", "score_seconds")},
+        })
+    return parts
+
+
+def drop_partials(client: MongoClient, db_name: str, run_id: str) -> None:
+    db = client[db_name]
+    db[SHARD_RESULTS_COLLECTION].delete_many({"runId": run_id})
+    db[SHARD_SERIES_COLLECTION].delete_many({"runId": run_id})
+
+
+def _print_totals(output: Dict[str, Any]) -> None:
+    t = output["totals"]
+    print(f"{t['twins']} twin(s): {t['high']} high, {t['medium']} medium, {t['low']} low; revenue at risk ₹{t['revenueAtRisk']:,.0f}")
+    with pd.option_context("display.width", 160):
+        print(output["shards"].to_string(index=False))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Score the fleet in hash-partitioned shards.")
+    parser.add_argument("--mongo-uri", default=MONGO_URI)
+    parser.add_argument("--db", default=DB_NAME)
+    parser.add_argument("--collections", nargs="+", default=COLLECTIONS, metavar="COLL")
+    parser.add_argument("--limit", type=int, default=1000, help="newest N docs of each whole collection (bounded by window_start), split across the shards by twin")
+    parser.add_argument("--horizon", type=float, default=72, help="prediction horizon in hours")
+    parser.add_argument("--compact", action="store_true", help="hold telemetry as float32/categorical columns")
+    sub = parser.add_subparsers(dest="command", required=True)
+    worker = sub.add_parser("worker", help="score one shard and store it under --run-id")
+    worker.add_argument("--run-id", required=True)
+    worker.add_argument("--shard", type=int, required=True)
+    worker.add_argument("--shards", type=int, required=True)
+    merge = sub.add_parser("merge", help="merge all shards of --run-id into the results collections")
+    merge.add_argument("--run-id", required=True)
+    merge.add_argument("--shards", type=int, required=True)
+    merge.add_argument("--timeout", type=float, default=600, help="seconds to wait for missing shards")
+    merge.add_argument("--keep-partials", action="store_true")
+    run = sub.add_parser("run", help="score every shard in local processes and write the merged run")
+    run.add_argument("--shards", type=int, required=True)
+    run.add_argument("--workers", type=int, help="worker processes (default: one per shard, up to the CPU count)")
+    args = parser.parse_args(argv)
+    if args.shards < 1:
+        parser.error("--shards must be at least 1")
+
+    client = MongoClient(args.mongo_uri)
+    if args.command == "worker":
+        part = score_shard(client, args.db, args.collections, args.shard, args.shards, limit=args.limit, compact=args.compact)
+        save_partial(client, args.db, args.run_id, args.shards, part)
+        print(f"Shard {args.shard}/{args.shards}: {part['twins']} twin(s) from {part['rows']} row(s) saved to run {args.run_id}")
+        return 0
+    if args.command == "merge":
+        parts = load_partials(client, args.db, args.run_id, args.shards, timeout=args.timeout)
+        output = merge_shards(parts, args.horizon)
+        run_id = args.run_id
+    else:
+        output = run_sharded(
+            args.mongo_uri, args.db, args.collections, args.shards, limit=args.limit, horizon_hours=args.horizon,
+            max_workers=args.workers, compact=args.compact,
+        )
+        run_id = None
+    _print_totals(output)
+    run_id = write_results_mongo(client, args.db, output, run_id=run_id)
+    print(f"Wrote run {run_id}")
+    if args.command == "merge" and not args.keep_partials:
+        drop_partials(client, args.db, args.run_id)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,284 @@
+"""Local Parquet / Arrow IPC telemetry snapshots.
+
+Mirrors each collection into date-partitioned files so backtests, retraining
+and offline scoring read local disk instead of the live cluster:
+
+    {root}/{collection}/date=YYYY-MM-DD/part-000001.parquet   (or .arrow)
+    {root}/{collection}/_state.json                           (sync cursor)
+
+``SnapshotStore.sync`` pages forward from the newest ``ts`` already exported,
+so repeated runs only copy new documents. ``SnapshotStore.load`` reads only
+the date partitions in range, only the requested columns, and memory-maps the
+files (Arrow IPC files are read zero-copy). pyarrow is imported on first read
+or write, so importing this module stays cheap.
+
+    python snapshot.py --root snapshots               # sync all collections
+    python snapshot.py --root snapshots --format arrow --collections turbine1
+"""
+import argparse
+import json
+import os
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pymongo import MongoClient
+
+from compact import compact_frame
+from telemetry import columns_to_df, discover_fields, load_columns
+
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "")
+# Documents fetched per page while syncing
+SYNC_BATCH_ROWS = 100_000
+
+
+def _raw_ts(val: Any) -> Any:
+    # Cursor values as stored: ISO strings, or datetimes (numpy from pymongoarrow)
+    if isinstance(val, np.datetime64):
+        return pd.Timestamp(val).to_pydatetime()
+    return val
+
+
+def _encode_ts(val: Any) -> Optional[Dict[str, str]]:
+    if val is None:
+        return None
+    if isinstance(val, datetime):
+        return {"type": "date", "value": val.isoformat()}
+    return {"type": "string", "value": str(val)}
+
+
+def _decode_ts(enc: Optional[Dict[str, str]]) -> Any:
+    if not enc:
+        return None
+    return datetime.fromisoformat(enc["value"]) if enc["type"] == "date" else enc["value"]
+
+
+def _bound(val: Any) -> Optional[pd.Timestamp]:
+    # Stored ts is tz-naive UTC, so aware bounds are converted to UTC first
+    if val is None:
+        return None
+    ts = pd.Timestamp(val)
+    return ts.tz_convert("UTC").tz_localize(None) if ts.tzinfo is not None else ts
+
+
+class SnapshotStore:
+    """Date-partitioned local copy of telemetry collections."""
+
+    def __init__(self, root: str, fmt: str = "parquet"):
+        if fmt not in FORMATS:
+            raise ValueError(f"unknown snapshot format {fmt!r}; expected one of {sorted(FORMATS)}")
+        self.root = root
+        self.fmt = fmt
+
+    def _coll_dir(self, coll: str) -> str:
+        return os.path.join(self.root, coll)
+
+    def state(self, coll: str) -> Dict[str, Any]:
+        path = os.path.join(self._coll_dir(coll), "_state.json")
+        if not os.path.exists(path):
+            return {"lastTs": None, "schema": {}, "rows": 0, "parts": 0}
+        with open(path) as f:
+            return json.load(f)
+
+    def _save_state(self, coll: str, state: Dict[str, Any]) -> None:
+        path = os.path.join(self._coll_dir(coll), "_state.json")
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp, path)
+
+    def partitions(self, coll: str) -> List[Tuple[date, str]]:
+        """(day, directory) of every partition of ``coll``, oldest first."""
+        base = self._coll_dir(coll)
+        if not os.path.isdir(base):
+            return []
+        out = []
+        for name in os.listdir(base):
+            if name.startswith("date="):
+                out.append((date.fromisoformat(name[5:]), os.path.join(base, name)))
+        return sorted(out)
+
+    def _write(self, coll: str, df: pd.DataFrame, state: Dict[str, Any]) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        days = df["ts"].dt.strftime("%Y-%m-%d")
+        for day, part in df.groupby(days, sort=True):
+            state["parts"] += 1
+            part_dir = os.path.join(self._coll_dir(coll), f"date={day}")
+            os.makedirs(part_dir, exist_ok=True)
+            path = os.path.join(part_dir, f"part-{state['parts']:06d}{FORMATS[self.fmt]}")
+            table = pa.Table.from_pandas(part.reset_index(drop=True), preserve_index=False)
+            tmp = f"{path}.tmp"
+            if self.fmt == "parquet":
+                pq.write_table(table, tmp)
+            else:
+                with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(tmp, path)
+
+    def sync(self, client: MongoClient, db_name: str, coll: str, batch_rows: int = SYNC_BATCH_ROWS) -> int:
+        """Append documents newer than the last exported ``ts``; returns how many were written.
+
+        Documents without a parseable ``ts`` are skipped (they cannot be
+        partitioned or synced incrementally).
+        """
+        os.makedirs(self._coll_dir(coll), exist_ok=True)
+        state = self.state(coll)
+        # New metric fields are picked up; fields seen before stay in the projection
+        schema = {**state["schema"], **discover_fields(client, db_name, coll)}
+        if "ts" not in schema:
+            return 0
+        state["schema"] = schema
+        last = _decode_ts(state["lastTs"])
+        written = 0
+        while True:
+            query = {"ts": {"$gt": last}} if last is not None else {"ts": {"$ne": None}}
+            cols = load_columns(client, db_name, coll, limit=batch_rows, schema=schema, query=query, oldest_first=True)
+            n = len(cols.get("ts", ()))
+            if n == 0:
+                break
+            full = n == batch_rows
+            if full:
+                # Leave rows sharing the page's last ts for the next page so none are skipped by $gt
+                ts = cols["ts"]
+                k = n
+                while k > 0 and ts[k - 1] == ts[n - 1]:
+                    k -= 1
+                if k > 0:
+                    cols = {f: arr[:k] for f, arr in cols.items()}
+                    n = k
+            df = columns_to_df(cols)
+            df = df[df["ts"].notna()]
+            if not df.empty:
+                self._write(coll, df, state)
+            last = _raw_ts(cols["ts"][n - 1])
+            state["lastTs"] = _encode_ts(last)
+            state["rows"] += len(df)
+            written += len(df)
+            self._save_state(coll, state)
+            if not full:
+                break
+        self._save_state(coll, state)
+        return written
+
+    def _read(self, path: str, columns: Optional[List[str]]) -> pd.DataFrame:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if path.endswith(".parquet"):
+            if columns is not None:
+                columns = [c for c in columns if c in pq.read_schema(path).names]
+            table = pq.read_table(path, columns=columns, memory_map=True)
+        else:
+            with pa.memory_map(path) as source:
+                table = pa.ipc.open_file(source).read_all()
+            if columns is not None:
+                table = table.select([c for c in columns if c in table.column_names])
+        return table.to_pandas()
+
+    def load(
+        self,
+        coll: str,
+        limit: Optional[int] = None,
+        start: Any = None,
+        end: Any = None,
+        columns: Optional[List[str]] = None,
+        compact: bool = False,
+    ) -> pd.DataFrame:
+        """Read ``coll`` newest first, shaped like ``to_df`` output.
+
+        Only partitions between ``start`` and ``end`` (inclusive, anything
+        ``pd.Timestamp`` accepts; naive values are taken as UTC) are opened,
+        newest first, stopping once ``limit`` rows are collected. ``columns``
+        restricts the metric columns read (``twinId`` and ``ts`` are always
+        included).
+        """
+        start, end = _bound(start), _bound(end)
+        lo, hi = (None if b is None else b.date() for b in (start, end))
+        wanted = None if columns is None else list(dict.fromkeys([*columns, "twinId", "ts"]))
+        parts: List[pd.DataFrame] = []
+        rows = 0
+        for day, part_dir in reversed(self.partitions(coll)):
+            if (lo is not None and day < lo) or (hi is not None and day > hi):
+                continue
+            # Higher part numbers were synced later and hold newer rows
+            for name in sorted(os.listdir(part_dir), reverse=True):
+                if not name.endswith(tuple(FORMATS.values())):
+                    continue
+                df = self._read(os.path.join(part_dir, name), wanted)
+                if start is not None:
+                    df = df[df["ts"] >= start]
+                if end is not None:
+                    df = df[df["ts"] <= end]
+                parts.append(df)
+                rows += len(df)
+            if limit is not None and rows >= limit:
+                break
+        parts = [p for p in parts if not p.empty]
+        if not parts:
+            return pd.DataFrame()
+        df = pd.concat(parts, ignore_index=True)
+        df["ts"] = df["ts"].astype("datetime64[ns]")
+        df = df.sort_values("ts", ascending=False, kind="stable", ignore_index=True)
+        if limit is not None:
+            df = df.head(limit)
+        # Same column order as to_df: metrics, then twinId, then ts
+        order = [c for c in df.columns if c not in ("twinId", "ts")] + [c for c in ("twinId", "ts") if c in df.columns]
+        df = df[order]
+        return compact_frame(df) if compact else df
+
+    def fetch(self, client: MongoClient, db_name: str, coll: str, limit: int) -> pd.DataFrame:
+        """``load_collections``-compatible fetch that reads the snapshot instead of Mongo."""
+        return self.load(coll, limit=limit)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-collection rows, partitions, bytes on disk and sync cursor."""
+        out = {}
+        if not os.path.isdir(self.root):
+            return out
+        for coll in sorted(os.listdir(self.root)):
+            parts = self.partitions(coll)
+            if not parts:
+                continue
+            state = self.state(coll)
+            size = sum(
+                os.path.getsize(os.path.join(d, n)) for _, d in parts for n in os.listdir(d) if n.endswith(tuple(FORMATS.values()))
+            )
+            out[coll] = {
+                "rows": state["rows"],
+                "partitions": len(parts),
+                "first": parts[0][0].isoformat(),
+                "last": parts[-1][0].isoformat(),
+                "mb": round(size / 2**20, 2),
+                "lastTs": (state["lastTs"] or {}).get("value"),
+            }
+        return out
+
+
+def main(argv=None) -> int:
+    from pipeline import COLLECTIONS, DB_NAME, MONGO_URI
+
+    parser = argparse.ArgumentParser(description="Export telemetry collections to a local date-partitioned snapshot.")
+    parser.add_argument("--mongo-uri", default=MONGO_URI)
+    parser.add_argument("--db", default=DB_NAME)
+    parser.add_argument("--collections", nargs="+", default=COLLECTIONS, metavar="COLL")
+    parser.add_argument("--root", default=SNAPSHOT_DIR or "snapshots", help="snapshot directory")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="parquet")
+    parser.add_argument("--batch-rows", type=int, default=SYNC_BATCH_ROWS, help="documents fetched per page")
+    args = parser.parse_args(argv)
+
+    client = MongoClient(args.mongo_uri)
+    store = SnapshotStore(args.root, fmt=args.format)
+    for coll in args.collections:
+        written = store.sync(client, args.db, coll, batch_rows=args.batch_rows)
+        print(f"{coll}: +{written} row(s)")
+    for coll, info in store.stats().items():
+        print(f"{coll}: {info['rows']} row(s) in {info['partitions']} partition(s), {info['first']}..{info['last']}, {info['mb']} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
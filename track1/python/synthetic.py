@@ -0,0 +1,110 @@
+"""Synthetic twin telemetry.
+
+Mimics the IoT simulator (``track1/upload_models/f_simulator.js``): the same
+per-twin fields and value ranges, a 10% chance per value of an anomaly (80%
+spike or 70% drop), values rounded to 2 decimals and ISO-8601 ``ts`` strings.
+Fleet size (twins per collection) and window (points per twin) are
+configurable so benchmarks can scale beyond the eight real twins.
+"""
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import bson
+from pymongo import MongoClient
+
+# field -> (base, span): normal values are base + U(0, 1) * span
+SCHEMAS: Dict[str, Dict[str, Tuple[float, float]]] = {
+    "drillrig1": {"torque": (50, 100), "pressure": (10, 50), "vibration": (20, 80)},
+    "wellhead1": {"pressure": (10, 50), "temperature": (50, 50), "flowRate": (100, 400)},
+    "pipeline1": {"pressure": (10, 50), "flowRate": (100, 400), "temperature": (50, 50)},
+    "compressor1": {"energyConsumption": (100, 900)},
+    "refinery1": {"temperature": (50, 50), "pressure": (10, 50), "throughput": (100, 400)},
+    "retail1": {"fuelInventory": (5000, 5000), "sales": (100, 500)},
+    "turbine1": {"temperature": (50, 100), "pressure": (10, 50), "vibration": (20, 80)},
+    "transformer1": {"voltage": (110, 10), "current": (5, 20)},
+}
+ANOMALY_RATE = 0.1
+INTERVAL_SECONDS = 10
+
+
+def _anomaly(rng: random.Random, value: float) -> float:
+    if rng.random() < ANOMALY_RATE:
+        return value * 1.8 if rng.random() < 0.5 else value * 0.3
+    return value
+
+
+def twin_ids(coll: str, twins: int) -> List[str]:
+    """``coll`` itself for the first twin (as in the simulator), then ``coll-2``, ``coll-3``, ..."""
+    return [coll] + [f"{coll}-{i}" for i in range(2, twins + 1)]
+
+
+def generate_docs(
+    coll: str, twins: int = 1, points: int = 500, seed: int = 0, start: Optional[datetime] = None
+) -> List[Dict[str, Any]]:
+    """Telemetry documents for ``twins`` twins x ``points`` readings of collection ``coll``."""
+    rng = random.Random(f"{seed}:{coll}")
+    start = start or datetime(2026, 1, 1, tzinfo=timezone.utc)
+    schema = SCHEMAS[coll]
+    docs = []
+    for i in range(points):
+        ts = (start + timedelta(seconds=i * INTERVAL_SECONDS)).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+        for twin in twin_ids(coll, twins):
+            doc: Dict[str, Any] = {"twinId": twin}
+            if coll == "compressor1":
+                doc["status"] = rng.random() > 0.5
+            for field, (base, span) in schema.items():
+                doc[field] = round(_anomaly(rng, base + rng.random() * span), 2)
+            doc["ts"] = ts
+            docs.append(doc)
+    return docs
+
+
+def seed_database(
+    client: MongoClient,
+    db_name: str,
+    twins: int = 1,
+    points: int = 500,
+    collections: Optional[List[str]] = None,
+    seed: int = 0,
+    drop: bool = True,
+) -> Dict[str, int]:
+    """Fill ``db_name`` with synthetic telemetry; returns documents written per collection."""
+    written = {}
+    for coll in collections or list(SCHEMAS):
+        if drop:
+            client[db_name][coll].drop()
+        docs = generate_docs(coll, twins=twins, points=points, seed=seed)
+        for i in range(0, len(docs), 10000):
+            client[db_name][coll].insert_many(docs[i:i + 10000], ordered=False)
+        written[coll] = len(docs)
+    return written
+
+
+def _find_raw_batches(self, filter=None, projection=None, sort=None, limit=0, batch_size=101, **kwargs):
+    cursor = self.find(filter or {}, projection)
+    if sort:
+        cursor = cursor.sort(sort)
+    if limit:
+        cursor = cursor.limit(limit)
+    batch = []
+    for doc in cursor:
+        batch.append(bson.encode(doc))
+        if len(batch) == batch_size:
+            yield b"".join(batch)
+            batch = []
+    if batch:
+        yield b"".join(batch)
+
+
+def mongomock_client():
+    """In-process ``mongomock`` client whose collections also serve ``find_raw_batches``.
+
+    mongomock does not implement raw batches, which the columnar fetch reads.
+    The shim BSON-encodes each batch of ``find`` results, so that path runs
+    without a server; the encoding is extra work a real server does not add.
+    """
+    import mongomock
+
+    mongomock.collection.Collection.find_raw_batches = _find_raw_batches
+    return mongomock.MongoClient()
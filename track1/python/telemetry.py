@@ -0,0 +1,178 @@
+"""Columnar telemetry fetch.
+
+Projects only the numeric metric fields plus ``ts``/``twinId`` and decodes the
+cursor straight into typed NumPy column arrays, so no list of full documents is
+ever materialized. ``pymongoarrow`` (in requirements.txt) does the decoding in
+native code without creating a Python object per document. Where it cannot be
+installed, raw BSON batches are decoded with ``bson`` one batch at a time;
+that fallback still builds a small dict per projected document.
+"""
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Optional
+
+import bson
+import numpy as np
+import pandas as pd
+from pymongo import MongoClient
+
+from compact import compact_frame
+
+# Fields that are never model features
+NON_FEATURE_FIELDS = ("_id", "status", "twinId", "ts")
+# Numeric fields excluded from features (mirrors to_df)
+EXCLUDED_FEATURES = ("sales", "lastsales")
+
+
+@lru_cache(maxsize=1)
+def has_pymongoarrow() -> bool:
+    # Checked on the first fetch rather than at import, so importing this module stays light
+    try:
+        import pymongoarrow.api  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def parse_ts(values: Any) -> Any:
+    """``ts`` values (ISO strings, BSON datetimes, datetime64) as tz-naive UTC; unparseable ones become NaT.
+
+    ``to_df``, ``columns_to_df`` and the stored scoring cursors all use this
+    one dtype, so frames decoded by different paths can be compared and mixed.
+    """
+    ts = pd.to_datetime(values, errors="coerce", utc=True)
+    return ts.dt.tz_localize(None) if isinstance(ts, pd.Series) else ts.tz_localize(None)
+
+
+def schema_of(docs: Iterable[Dict[str, Any]]) -> Dict[str, str]:
+    """{field: kind} of ``docs``, as returned by ``discover_fields``."""
+    schema: Dict[str, str] = {}
+    for doc in docs:
+        for key, val in doc.items():
+            if key in schema:
+                continue
+            if key == "twinId":
+                schema[key] = "string"
+            elif key == "ts":
+                schema[key] = "date" if hasattr(val, "tzinfo") else "string"
+            elif key in NON_FEATURE_FIELDS or str(key).lower() in EXCLUDED_FEATURES:
+                continue
+            elif isinstance(val, (int, float)) and not isinstance(val, bool):
+                schema[key] = "float"
+    return schema
+
+
+def discover_fields(client: MongoClient, db_name: str, coll: str, sample: int = 20) -> Dict[str, str]:
+    """Infer the projected schema from the newest ``sample`` documents.
+
+    Returns {field: kind} with kind one of "float" (numeric metrics), "string"
+    (twinId, ISO-string ts) or "date" (BSON datetime ts), in first-seen order.
+    """
+    return schema_of(client[db_name][coll].find({}, {"_id": 0}).sort("ts", -1).limit(sample))
+
+
+def docs_to_columns(docs: Iterable[Dict[str, Any]], schema: Dict[str, str], size: int) -> Dict[str, np.ndarray]:
+    """Columns of the ``schema`` fields of up to ``size`` already-decoded ``docs`` (see ``load_columns``)."""
+    cols: Dict[str, np.ndarray] = {
+        f: np.full(size, np.nan, dtype=np.float64) if k == "float" else np.empty(size, dtype=object)
+        for f, k in schema.items()
+    }
+    n = 0
+    for doc in docs:
+        if n >= size:
+            break
+        for f, val in doc.items():
+            arr = cols.get(f)
+            if arr is None:
+                continue
+            if arr.dtype == np.float64:
+                if isinstance(val, (int, float)) and not isinstance(val, bool):
+                    arr[n] = val
+            else:
+                arr[n] = val
+        n += 1
+    return {f: arr[:n] for f, arr in cols.items()}
+
+
+def load_columns(
+    client: MongoClient,
+    db_name: str,
+    coll: str,
+    limit: int = 1000,
+    schema: Optional[Dict[str, str]] = None,
+    query: Optional[Dict[str, Any]] = None,
+    stats: Optional[Dict[str, int]] = None,
+    oldest_first: bool = False,
+) -> Dict[str, np.ndarray]:
+    """Fetch the newest ``limit`` documents of ``coll`` matching ``query`` as {field: ndarray}.
+
+    Metric columns are float64 (missing values become NaN); ``twinId`` and
+    ``ts`` are object arrays as stored. Use ``columns_to_df`` to get the same
+    frame shape as ``to_df``. If ``stats`` is given, the documents and bytes
+    fetched are added to its "docs" and "bytes" counters. ``oldest_first``
+    returns the oldest ``limit`` matches in ascending ``ts`` order instead
+    (for paging forward through history).
+    """
+    if schema is None:
+        schema = discover_fields(client, db_name, coll)
+    if not schema:
+        return {}
+    projection = {"_id": 0, **{f: 1 for f in schema}}
+    collection = client[db_name][coll]
+    query = query or {}
+    sort = [("ts", 1 if oldest_first else -1)]
+
+    if has_pymongoarrow():
+        import pyarrow as pa
+        from pymongoarrow.api import Schema, find_numpy_all
+
+        kinds = {"float": pa.float64(), "string": pa.string(), "date": pa.timestamp("ms")}
+        arrow_schema = Schema({f: kinds[k] for f, k in schema.items()})
+        cols = find_numpy_all(
+            collection, query, schema=arrow_schema, projection=projection, sort=sort, limit=limit
+        )
+        if stats is not None:
+            # Decoded column sizes; pymongoarrow does not expose the wire size
+            stats["docs"] = stats.get("docs", 0) + (len(next(iter(cols.values()))) if cols else 0)
+            stats["bytes"] = stats.get("bytes", 0) + sum(getattr(a, "nbytes", 0) for a in cols.values())
+        return cols
+
+    nbytes = 0
+
+    def batches():
+        nonlocal nbytes
+        for batch in collection.find_raw_batches(query, projection, sort=sort, limit=limit):
+            nbytes += len(batch)
+            # Only the projected keys are decoded, one batch at a time
+            yield from bson.decode_all(batch)
+
+    cols = docs_to_columns(batches(), schema, limit)
+    if stats is not None:
+        stats["docs"] = stats.get("docs", 0) + len(next(iter(cols.values())))
+        stats["bytes"] = stats.get("bytes", 0) + nbytes
+    return cols
+
+
+def columns_to_df(cols: Dict[str, np.ndarray], compact: bool = False) -> pd.DataFrame:
+    """Wrap fetched columns in a DataFrame shaped like ``to_df`` output (``compact_frame`` layout if ``compact``)."""
+    if not cols or not len(next(iter(cols.values()))):
+        return pd.DataFrame()
+    features = {f: arr for f, arr in cols.items() if f not in ("twinId", "ts")}
+    df = pd.DataFrame(features, copy=False)
+    if "twinId" in cols:
+        df["twinId"] = cols["twinId"]
+    if "ts" in cols:
+        df["ts"] = parse_ts(cols["ts"])
+    return compact_frame(df) if compact else df
+
+
+def load_frame(
+    client: MongoClient,
+    db_name: str,
+    coll: str,
+    limit: int = 1000,
+    stats: Optional[Dict[str, int]] = None,
+    compact: bool = False,
+    query: Optional[Dict[str, Any]] = None,
+) -> pd.DataFrame:
+    """Projected columnar equivalent of ``to_df(load_docs(...))``; ``query`` narrows the documents read."""
+    return columns_to_df(load_columns(client, db_name, coll, limit=limit, query=query, stats=stats), compact=compact)